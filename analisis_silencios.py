@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Análisis de silencios para elegir puntos de corte
+- Una sola pasada: FFmpeg decodifica a PCM mono de baja resolución por un pipe
+- Bloques de tamaño fijo procesados con NumPy (memoria acotada)
+- Los intervalos de silencio se guardan en caché por archivo, así que cambiar
+  la duración de los fragmentos no vuelve a decodificar
+"""
+
+import subprocess
+import threading
+
+from cache_audio import FileCache
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: solo lo necesita este análisis
+    np = None
+
+
+ANALYSIS_RATE = 8000          # Hz; suficiente para distinguir voz de silencio
+FRAME_SECONDS = 0.05          # Resolución del análisis (50 ms)
+BLOCK_SECONDS = 30            # Audio leído del pipe en cada bloque
+DEFAULT_THRESHOLD_DB = -40.0  # Nivel RMS (dBFS) por debajo del cual hay silencio
+DEFAULT_MIN_SILENCE = 0.4     # Duración mínima de un silencio útil (segundos)
+DEFAULT_SEARCH_WINDOW = 30.0  # Margen alrededor de cada corte nominal (segundos)
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+_silence_cache = None
+_silence_cache_lock = threading.Lock()
+
+
+def silence_cache():
+    """Instancia compartida de la caché de silencios."""
+    global _silence_cache
+    with _silence_cache_lock:
+        if _silence_cache is None:
+            _silence_cache = FileCache("silencios", max_entries=500)
+        return _silence_cache
+
+
+def numpy_available():
+    return np is not None
+
+
+def detect_silences(input_file, threshold_db=DEFAULT_THRESHOLD_DB,
+                    min_silence=DEFAULT_MIN_SILENCE, popen_flags=None,
+                    should_stop=None, use_cache=True):
+    """Devuelve la lista de silencios ``[[inicio, fin], ...]`` en segundos.
+
+    Decodifica la entrada una sola vez a PCM mono s16 a 8 kHz y calcula el
+    nivel RMS de tramas de 50 ms bloque a bloque; solo se conserva el estado
+    del silencio en curso entre bloques.
+    """
+    if np is None:
+        raise RuntimeError("El análisis de silencios requiere NumPy (pip install numpy)")
+
+    variant = f"{threshold_db:g}|{min_silence:g}"
+    if use_cache:
+        cached = silence_cache().get_for_file(input_file, variant)
+        if cached is not None:
+            return cached
+
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-i", str(input_file),
+        "-vn",
+        "-map", "0:a:0",
+        "-ac", "1",
+        "-ar", str(ANALYSIS_RATE),
+        "-f", "s16le",
+        "-"
+    ]
+
+    frame_samples = int(ANALYSIS_RATE * FRAME_SECONDS)
+    block_bytes = frame_samples * int(BLOCK_SECONDS / FRAME_SECONDS) * 2
+    # Umbral como energía media por trama (evita sqrt/log por trama)
+    threshold_power = (10 ** (threshold_db / 20) * 32768) ** 2
+
+    silences = []
+    silence_start = None
+    frames_done = 0
+    pending = b""
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               **(popen_flags or {}))
+    try:
+        while True:
+            if should_stop and should_stop():
+                raise InterruptedError("Análisis de silencios cancelado")
+            chunk = process.stdout.read(block_bytes)
+            if not chunk:
+                break
+            data = pending + chunk
+            usable = len(data) - len(data) % (frame_samples * 2)
+            pending = data[usable:]
+            if not usable:
+                continue
+
+            samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32)
+            power = np.mean(samples.reshape(-1, frame_samples) ** 2, axis=1)
+            quiet = power < threshold_power
+
+            # Bordes de los tramos silenciosos, teniendo en cuenta si el
+            # bloque anterior terminó en silencio
+            was_quiet = silence_start is not None
+            steps = np.diff(np.concatenate(([int(was_quiet)], quiet.astype(np.int8))))
+            starts = np.flatnonzero(steps == 1)
+            ends = np.flatnonzero(steps == -1)
+
+            if was_quiet and len(ends):
+                _add_silence(silences, silence_start, frames_done + ends[0], min_silence)
+                silence_start = None
+                ends = ends[1:]
+            if silence_start is None:
+                for k, start in enumerate(starts):
+                    if k < len(ends):
+                        _add_silence(silences, frames_done + start, frames_done + ends[k], min_silence)
+                    else:
+                        silence_start = frames_done + start
+
+            frames_done += len(quiet)
+
+        if silence_start is not None:
+            _add_silence(silences, silence_start, frames_done, min_silence)
+
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg terminó con código {process.returncode} al analizar silencios")
+
+    if use_cache:
+        silence_cache().put_for_file(input_file, silences, variant)
+    return silences
+
+
+def _add_silence(silences, start_frame, end_frame, min_silence):
+    start = int(start_frame) * FRAME_SECONDS
+    end = int(end_frame) * FRAME_SECONDS
+    if end - start >= min_silence:
+        silences.append([round(start, 3), round(end, 3)])
+
+
+def choose_split_points(silences, chunk_duration, total_duration,
+                        search_window=DEFAULT_SEARCH_WINDOW):
+    """Elige un corte por fragmento, en el silencio más cercano al corte nominal.
+
+    Cada corte nominal se mide desde el corte anterior, así los fragmentos
+    mantienen su duración aproximada. Si no hay silencio en el margen, se
+    corta en el punto nominal. Un resto final más corto que el margen de
+    búsqueda se une al último fragmento.
+    """
+    points = []
+    previous = 0.0
+    index = 0
+    min_tail = max(search_window, 1)
+    while True:
+        target = previous + chunk_duration
+        if total_duration - target < min_tail:
+            break
+
+        best = None
+        while index < len(silences) and silences[index][1] < target - search_window:
+            index += 1
+        for start, end in silences[index:]:
+            if start > target + search_window:
+                break
+            # Silencio corto: cortar en el centro. Largo: en el punto más
+            # próximo al nominal, dejando un margen respecto a la voz
+            if end - start > 1:
+                cut = min(max(target, start + 0.25), end - 0.25)
+            else:
+                cut = (start + end) / 2
+            if abs(cut - target) > search_window:
+                continue
+            if best is None or abs(cut - target) < abs(best - target):
+                best = cut
+        cut = best if best is not None and best > previous + 1 else target
+        if total_duration - cut < min_tail:
+            break
+        points.append(round(cut, 3))
+        previous = cut
+    return points
+
+
+def find_split_points(input_file, chunk_duration, total_duration,
+                      threshold_db=DEFAULT_THRESHOLD_DB, min_silence=DEFAULT_MIN_SILENCE,
+                      search_window=DEFAULT_SEARCH_WINDOW, log=_noop, **kwargs):
+    """Analiza (o lee de caché) los silencios y devuelve la lista de cortes."""
+    silences = detect_silences(input_file, threshold_db=threshold_db,
+                               min_silence=min_silence, **kwargs)
+    points = choose_split_points(silences, chunk_duration, total_duration, search_window)
+    log(f"🤫 {len(silences)} silencios detectados; {len(points)} cortes ajustados")
+    return points
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Banco de rendimiento reproducible para el motor de conversión
+- Genera las entradas localmente con las fuentes lavfi de FFmpeg
+  (varias duraciones y distribuciones de canales, cacheadas en disco)
+- Recorre una matriz de duración de fragmento, calidad y concurrencia
+- Cada caso corre en un proceso aparte: tiempo de CPU y pico de memoria
+  (incluidos los FFmpeg hijos) no se mezclan entre casos
+- Informe JSON con factor de tiempo real, tiempo de pared, CPU y RSS pico,
+  comparable con una línea base guardada
+
+Uso:
+    python banco_rendimiento.py --lengths 60 600 --layouts mono stereo -o informe.json
+    python banco_rendimiento.py --baseline base.json --tolerance 0.10
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from cache_audio import cache_dir
+from motor_conversion import ConversionEngine
+
+try:
+    import resource
+except ImportError:  # Windows: sin getrusage, CPU y RSS quedan sin medir
+    resource = None
+
+
+# Señales de prueba por distribución de canales: un tono distinto por canal
+LAYOUTS = {
+    "mono": ["sin(440*2*PI*t)"],
+    "stereo": ["sin(440*2*PI*t)", "sin(660*2*PI*t)"],
+    "5.1": ["sin(440*2*PI*t)", "sin(550*2*PI*t)", "sin(660*2*PI*t)",
+            "0.1*sin(55*2*PI*t)", "sin(770*2*PI*t)", "sin(880*2*PI*t)"],
+}
+
+# Métricas comparadas con la línea base: (clave, True si más alto es mejor)
+COMPARED_METRICS = (("realtime", True), ("wall", False), ("cpu", False), ("peak_rss_mb", False))
+
+
+def ffmpeg_version():
+    try:
+        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+        return result.stdout.splitlines()[0] if result.stdout else ""
+    except OSError:
+        return ""
+
+
+def generate_input(seconds, layout, directory=None):
+    """Crea (o reutiliza) una entrada M4A/AAC sintética de ``seconds`` segundos."""
+    directory = Path(directory or cache_dir() / "banco")
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"lavfi_{layout.replace('.', '')}_{seconds}s.m4a"
+    if path.exists() and path.stat().st_size:
+        return path
+
+    channels = LAYOUTS[layout]
+    source = f"aevalsrc={'|'.join(channels)}:s=44100:d={seconds}:c={layout}"
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", source,
+        "-c:a", "aac", "-b:a", f"{64 * len(channels)}k",
+        str(path)
+    ]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def _rusage():
+    """(CPU en segundos, RSS pico en MB) de este proceso más sus hijos."""
+    if resource is None:
+        return None, None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    scale = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    return cpu, max(own.ru_maxrss, children.ru_maxrss) / scale
+
+
+def run_case(case):
+    """Ejecuta un caso en este proceso y devuelve sus métricas."""
+    output_dir = Path(tempfile.mkdtemp(prefix="banco_"))
+    try:
+        engine = ConversionEngine(
+            case["input"],
+            output_dir,
+            chunk_duration=case["chunk"],
+            quality=case["quality"],
+            parallel=case["workers"] > 0,
+            max_workers=case["workers"] or None,
+            resume=False,
+            intermediate_cache=False,
+            conversion_cache=False
+        )
+        cpu_before, _ = _rusage()
+        start = time.perf_counter()
+        result = engine.run()
+        wall = time.perf_counter() - start
+        cpu_after, peak_rss = _rusage()
+        files = result["files"]
+        return {
+            "ok": result["ok"],
+            "message": result["message"],
+            "wall": wall,
+            "cpu": cpu_after - cpu_before if cpu_after is not None else None,
+            "peak_rss_mb": peak_rss,
+            "realtime": engine.total_duration / wall if wall > 0 else 0.0,
+            "fragments": len(files),
+            "output_bytes": sum(f.stat().st_size for f in files)
+        }
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def run_isolated(case):
+    """Ejecuta un caso en un intérprete nuevo (métricas de proceso limpias)."""
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--run-case", json.dumps(case)]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0 or not result.stdout.strip():
+        return {"ok": False, "message": result.stderr.strip()[-500:] or "sin salida"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def case_key(case):
+    """Clave estable de un caso para compararlo con otros informes."""
+    return (f"{case['layout']}|{case['seconds']}s|chunk={case['chunk']:g}"
+            f"|q={case['quality']}|w={case['workers']}")
+
+
+def build_matrix(args):
+    cases = []
+    for seconds, layout in itertools.product(args.lengths, args.layouts):
+        input_file = generate_input(seconds, layout, args.input_dir)
+        for chunk, quality, workers in itertools.product(args.chunks, args.qualities, args.workers):
+            cases.append({"input": str(input_file), "seconds": seconds, "layout": layout,
+                          "chunk": chunk, "quality": quality, "workers": workers})
+    return cases
+
+
+def run_matrix(cases, repeat=1, log=print):
+    """Ejecuta cada caso ``repeat`` veces y se queda con la mediana del tiempo."""
+    results = []
+    for number, case in enumerate(cases, 1):
+        runs = [run_isolated(case) for _ in range(repeat)]
+        good = [run for run in runs if run.get("ok")]
+        if good:
+            good.sort(key=lambda run: run["wall"])
+            metrics = dict(good[len(good) // 2], runs=len(good))
+            metrics["wall_stdev"] = statistics.pstdev(run["wall"] for run in good)
+        else:
+            metrics = dict(runs[-1], runs=0)
+        entry = dict(case, key=case_key(case), **metrics)
+        results.append(entry)
+        if metrics.get("ok"):
+            log(f"[{number}/{len(cases)}] {entry['key']}: {metrics['realtime']:.1f}x, "
+                f"{metrics['wall']:.2f}s")
+        else:
+            log(f"[{number}/{len(cases)}] {entry['key']}: ERROR {metrics.get('message', '')}")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Compara con la línea base; devuelve (comparaciones, regresiones)."""
+    previous = {entry["key"]: entry for entry in baseline.get("results", [])}
+    comparisons = []
+    regressions = []
+    for entry in results:
+        old = previous.get(entry["key"])
+        if not old or not old.get("ok") or not entry.get("ok"):
+            continue
+        deltas = {}
+        for metric, higher_is_better in COMPARED_METRICS:
+            if not old.get(metric) or entry.get(metric) is None:
+                continue
+            change = entry[metric] / old[metric] - 1.0
+            deltas[metric] = round(change, 4)
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append({"key": entry["key"], "metric": metric,
+                                    "baseline": old[metric], "current": entry[metric],
+                                    "change": round(change, 4)})
+        comparisons.append({"key": entry["key"], "changes": deltas})
+    return comparisons, regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Banco de rendimiento del motor con audio sintético (lavfi)."
+    )
+    parser.add_argument("--lengths", type=int, nargs="+", default=[60, 600],
+                        help="Duraciones de las entradas en segundos (por defecto: %(default)s)")
+    parser.add_argument("--layouts", nargs="+", default=["mono", "stereo"], choices=sorted(LAYOUTS),
+                        help="Distribuciones de canales (por defecto: %(default)s)")
+    parser.add_argument("--chunks", type=float, nargs="+", default=[60, 300],
+                        help="Duraciones de fragmento en segundos (por defecto: %(default)s)")
+    parser.add_argument("--qualities", type=int, nargs="+", default=[2, 5],
+                        help="Calidades VBR de LAME (por defecto: %(default)s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4],
+                        help="Procesos en paralelo; 0 = segmentador secuencial "
+                             "(por defecto: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Repeticiones por caso; se usa la mediana (por defecto: %(default)s)")
+    parser.add_argument("--input-dir", type=Path, default=None,
+                        help="Carpeta para las entradas generadas (por defecto: en la caché)")
+    parser.add_argument("-o", "--output", type=Path, default=None,
+                        help="Guardar el informe JSON en este archivo")
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="Informe anterior con el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Empeoramiento relativo tolerado frente a la línea base "
+                             "(por defecto: %(default)s)")
+    parser.add_argument("--run-case", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return 0
+
+    log = lambda message: print(message, file=sys.stderr)
+    cases = build_matrix(args)
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "ffmpeg": ffmpeg_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat
+        },
+        "results": run_matrix(cases, repeat=args.repeat, log=log)
+    }
+
+    exit_code = 0 if all(entry.get("ok") for entry in report["results"]) else 1
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        comparisons, regressions = compare(report["results"], baseline, args.tolerance)
+        report["comparison"] = {"baseline": str(args.baseline), "tolerance": args.tolerance,
+                                "cases": comparisons, "regressions": regressions}
+        for regression in regressions:
+            log(f"⚠️ Regresión en {regression['key']}: {regression['metric']} "
+                f"{regression['change']:+.1%}")
+        if regressions:
+            exit_code = 1
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cachés persistentes en disco para el conversor
+- Carpeta de caché por usuario (Windows/Linux/macOS)
+- Caché JSON con expulsión LRU, compartida por GUI, CLI y lotes
+- Cachés por archivo indexadas por ruta, tamaño y fecha de modificación
+  (ffprobe, análisis de silencios)
+"""
+
+import json
+import os
+import platform
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+def cache_dir():
+    """Carpeta de caché del usuario (se puede forzar con CONVERSOR_CACHE_DIR)."""
+    override = os.environ.get("CONVERSOR_CACHE_DIR")
+    if override:
+        base = Path(override)
+    elif platform.system() == "Windows":
+        base = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / "conversor_mp3"
+    elif platform.system() == "Darwin":
+        base = Path.home() / "Library" / "Caches" / "conversor_mp3"
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "conversor_mp3"
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        pass
+    return base
+
+
+def file_signature(path):
+    """Devuelve (ruta absoluta, tamaño, mtime_ns) o None si el archivo no existe."""
+    try:
+        path = Path(path).resolve()
+        stat = path.stat()
+    except OSError:
+        return None
+    return str(path), stat.st_size, stat.st_mtime_ns
+
+
+class JsonCache:
+    """Diccionario persistente en un archivo JSON con expulsión LRU.
+
+    Se carga al primer acceso y se reescribe de forma atómica en cada
+    ``put``; el orden del archivo es el orden de uso (el último, el más
+    reciente).
+    """
+
+    def __init__(self, name, max_entries=2000, directory=None):
+        self.path = Path(directory or cache_dir()) / f"{name}.json"
+        self.max_entries = max_entries
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            self._entries = OrderedDict()
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def get(self, key):
+        with self._lock:
+            self._load()
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._load()
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def discard(self, key):
+        with self._lock:
+            self._load()
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+
+class FileCache(JsonCache):
+    """Caché de resultados calculados a partir de un archivo; una entrada deja
+    de valer si cambian el tamaño o la fecha de modificación del archivo.
+
+    ``variant`` permite guardar varios resultados por archivo (p. ej. el
+    mismo análisis con distintos parámetros).
+    """
+
+    # Se incrementa cuando cambia el formato de los resultados guardados
+    VERSION = 1
+
+    def get_for_file(self, input_file, variant=""):
+        signature = file_signature(input_file)
+        if signature is None:
+            return None
+        path, size, mtime_ns = signature
+        entry = self.get(f"{path}|{variant}" if variant else path)
+        if (entry and entry.get("version") == self.VERSION
+                and entry["size"] == size and entry["mtime_ns"] == mtime_ns):
+            return entry["info"]
+        return None
+
+    def put_for_file(self, input_file, info, variant=""):
+        signature = file_signature(input_file)
+        if signature is None:
+            return
+        path, size, mtime_ns = signature
+        self.put(f"{path}|{variant}" if variant else path,
+                 {"version": self.VERSION, "size": size, "mtime_ns": mtime_ns, "info": info})
+
+
+class ProbeCache(FileCache):
+    """Caché de resultados de ffprobe por archivo."""
+
+    # Se incrementa cuando cambian los campos que devuelve get_audio_info
+    VERSION = 3
+
+    def __init__(self, max_entries=2000, directory=None):
+        super().__init__("ffprobe", max_entries=max_entries, directory=directory)
+
+    def get_info(self, input_file):
+        return self.get_for_file(input_file)
+
+    def put_info(self, input_file, info):
+        self.put_for_file(input_file, info)
+
+
+_probe_cache = None
+_probe_cache_lock = threading.Lock()
+
+
+def probe_cache():
+    """Instancia compartida de la caché de ffprobe."""
+    global _probe_cache
+    with _probe_cache_lock:
+        if _probe_cache is None:
+            _probe_cache = ProbeCache()
+        return _probe_cache
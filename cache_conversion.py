@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché de conversiones por contenido
+- La clave es una huella de los bytes de la entrada (BLAKE2b leído en
+  bloques grandes) más los parámetros de codificación y de corte
+- La misma grabación con otro nombre o en otra carpeta no se vuelve a
+  codificar: sus fragmentos se copian (con reflink si el sistema de
+  archivos lo admite), nunca se comparten con la salida
+- La huella de cada archivo se recuerda por ruta, tamaño y mtime
+- Presupuesto de tamaño en disco con expulsión LRU; índice JSON
+"""
+
+import hashlib
+import json
+import os
+import platform
+import shutil
+import threading
+from pathlib import Path
+
+from cache_audio import FileCache, JsonCache, cache_dir
+from cache_intermedia import ENCODER_FIELDS
+
+
+DEFAULT_BUDGET_BYTES = 5 * 1000 ** 3
+HASH_BLOCK_BYTES = 8 * 1024 * 1024
+
+# ioctl de Linux que clona un archivo compartiendo bloques con copia en
+# escritura (btrfs, XFS...): escribir en la copia no toca el original
+FICLONE = 0x40049409
+
+# Campos de cada salida que cambian los fragmentos escritos. "copy" no
+# entra: depende de la propia entrada (ya es MP3) o sale de un intermedio
+# con el mismo audio.
+OUTPUT_FIELDS = ENCODER_FIELDS + ("format", "extension", "segment_format")
+
+
+def content_hash(path, block_size=HASH_BLOCK_BYTES):
+    """Huella BLAKE2b (hex) del contenido de ``path``.
+
+    Se lee en bloques grandes sobre un único búfer reutilizado: la
+    velocidad la marca el disco, no Python.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+def conversion_key(content, params):
+    """Clave de una conversión: huella de la entrada y parámetros."""
+    data = json.dumps([content, params], sort_keys=True)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _reflink(source, destination):
+    """Clona ``source`` en ``destination`` con FICLONE; False si no se puede."""
+    if platform.system() != "Linux":
+        return False
+    import fcntl
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            return False
+    return True
+
+
+def clone_or_copy(source, destination):
+    """Copia ``source`` en ``destination``, con reflink si se puede.
+
+    Nunca con un hardlink: FFmpeg (``-y``) y los editores de etiquetas
+    reescriben las salidas en el sitio y estropearían la caché. Devuelve
+    True si se clonó. El destino se sustituye de forma atómica.
+    """
+    destination = Path(destination)
+    tmp_path = destination.with_name(destination.name + ".part")
+    try:
+        os.remove(tmp_path)
+    except OSError:
+        pass
+    cloned = _reflink(source, tmp_path)
+    if not cloned:
+        # Otro sistema de archivos o sin copia en escritura
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
+    return cloned
+
+
+class ContentHashCache(FileCache):
+    """Huella de contenido por archivo: no se relee si no cambió."""
+
+    def __init__(self, max_entries=5000, directory=None):
+        super().__init__("huellas", max_entries=max_entries, directory=directory)
+
+    def hash_for(self, input_file):
+        content = self.get_for_file(input_file)
+        if content is None:
+            content = content_hash(input_file)
+            self.put_for_file(input_file, content)
+        return content
+
+
+class ConversionCache(JsonCache):
+    """Fragmentos convertidos por clave de contenido, con presupuesto en bytes.
+
+    Cada entrada guarda, por salida, los fragmentos (índice, inicio, fin,
+    tamaño) y viven en ``conversiones/<clave>/``. Al superar
+    ``budget_bytes`` se borran las entradas menos usadas. Los fragmentos
+    son copias propias: lo que se haga después con las salidas no les afecta.
+    """
+
+    VERSION = 1
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES, directory=None):
+        # El límite real es el presupuesto en bytes, no el número de entradas
+        super().__init__("conversiones", max_entries=100_000, directory=directory)
+        self.files_dir = self.path.parent / "conversiones"
+        self.budget_bytes = budget_bytes
+
+    def lookup(self, key):
+        """Fragmentos de ``key`` por salida, o None (la marca como usada).
+
+        Cada fragmento es un dict con ``file``, ``index``, ``start`` y ``end``.
+        """
+        entry = self.get(key)
+        if not entry or entry.get("version") != self.VERSION:
+            return None
+        outputs = []
+        for fragments in entry["outputs"]:
+            found = []
+            for fragment in fragments:
+                path = self.files_dir / key / fragment["name"]
+                try:
+                    valid = path.stat().st_size == fragment["size"]
+                except OSError:
+                    valid = False
+                if not valid:
+                    self.remove(key)
+                    return None
+                found.append(dict(fragment, file=path))
+            outputs.append(found)
+        # Volver a guardar la entrada la mueve al final del orden LRU en disco
+        self.put(key, entry)
+        return outputs
+
+    def store(self, key, outputs):
+        """Guarda los fragmentos de una conversión; True si entraron en la caché.
+
+        ``outputs`` tiene, por salida, dicts con ``file``, ``index``,
+        ``start`` y ``end``.
+        """
+        directory = self.files_dir / key
+        tmp_dir = self.files_dir / f"{key}.part"
+        entries = []
+        size = 0
+        try:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir(parents=True)
+            for position, fragments in enumerate(outputs):
+                stored = []
+                for fragment in fragments:
+                    source = Path(fragment["file"])
+                    name = f"{position}_{fragment['index']:03d}{source.suffix}"
+                    clone_or_copy(source, tmp_dir / name)
+                    fragment_size = (tmp_dir / name).stat().st_size
+                    size += fragment_size
+                    stored.append({"name": name, "index": fragment["index"],
+                                   "start": fragment["start"], "end": fragment["end"],
+                                   "size": fragment_size})
+                entries.append(stored)
+            if not size or size > self.budget_bytes:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return False
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(tmp_dir, directory)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+        self.put(key, {"version": self.VERSION, "size": size, "outputs": entries})
+        self.evict()
+        return True
+
+    def remove(self, key):
+        self.discard(key)
+        shutil.rmtree(self.files_dir / key, ignore_errors=True)
+
+    def total_bytes(self):
+        with self._lock:
+            self._load()
+            return sum(entry.get("size", 0) for entry in self._entries.values())
+
+    def evict(self):
+        """Borra las conversiones menos usadas hasta cumplir el presupuesto."""
+        removed = []
+        with self._lock:
+            self._load()
+            total = sum(entry.get("size", 0) for entry in self._entries.values())
+            for key in list(self._entries):
+                if total <= self.budget_bytes:
+                    break
+                total -= self._entries.pop(key).get("size", 0)
+                removed.append(key)
+            if removed:
+                self._save()
+        for key in removed:
+            shutil.rmtree(self.files_dir / key, ignore_errors=True)
+        return removed
+
+
+_hash_cache = None
+_conversion_cache = None
+_cache_lock = threading.Lock()
+
+
+def hash_cache():
+    """Instancia compartida de la caché de huellas."""
+    global _hash_cache
+    with _cache_lock:
+        if _hash_cache is None:
+            _hash_cache = ContentHashCache(directory=cache_dir())
+        return _hash_cache
+
+
+def conversion_cache():
+    """Instancia compartida de la caché de conversiones."""
+    global _conversion_cache
+    with _cache_lock:
+        if _conversion_cache is None:
+            _conversion_cache = ConversionCache(directory=cache_dir())
+        return _conversion_cache
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché de MP3 intermedios completos
+- Tras codificar una entrada se guarda el MP3 entero (una sola pista)
+- Una nueva división con otra duración de fragmento se hace por copia de
+  tramas desde ese MP3, sin volver a pasar por libmp3lame
+- Indexado por entrada (ruta, tamaño, mtime) y parámetros del codificador
+- Presupuesto de tamaño en disco con expulsión LRU
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from cache_audio import FileCache, cache_dir
+
+
+DEFAULT_BUDGET_BYTES = 2 * 1000 ** 3
+
+# Campos de la salida que cambian el MP3 codificado
+ENCODER_FIELDS = ("codec", "quality", "bitrate", "channels", "sample_rate", "compression_level")
+
+
+def encoder_variant(output):
+    """Clave de los parámetros de codificación de una salida."""
+    return json.dumps([output.get(field) for field in ENCODER_FIELDS])
+
+
+class IntermediateCache(FileCache):
+    """MP3 intermedios por entrada y parámetros, con presupuesto en bytes.
+
+    El índice JSON guarda el orden de uso; al superar ``budget_bytes`` se
+    borran los menos usados. Los archivos viven en ``intermedios/``.
+    """
+
+    VERSION = 1
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES, directory=None):
+        # El límite real es el presupuesto en bytes, no el número de entradas
+        super().__init__("intermedios", max_entries=100_000, directory=directory)
+        self.files_dir = self.path.parent / "intermedios"
+        self.budget_bytes = budget_bytes
+
+    def lookup(self, input_file, variant):
+        """Ruta del MP3 intermedio de ``input_file``, o None (lo marca como usado)."""
+        info = self.get_for_file(input_file, variant)
+        if not info:
+            return None
+        path = self.files_dir / info["file"]
+        try:
+            valid = path.stat().st_size == info["size"]
+        except OSError:
+            valid = False
+        if not valid:
+            self._forget(input_file, variant)
+            return None
+        # Volver a guardar la entrada la mueve al final del orden LRU
+        self.put_for_file(input_file, info, variant)
+        return path
+
+    def reserve(self):
+        """Ruta temporal donde escribir un nuevo intermedio."""
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        return self.files_dir / f"{uuid.uuid4().hex}.mp3.part"
+
+    def store(self, input_file, variant, tmp_path, duration=None):
+        """Incorpora ``tmp_path`` a la caché; devuelve la ruta final o None."""
+        tmp_path = Path(tmp_path)
+        try:
+            size = tmp_path.stat().st_size
+            if not size or size > self.budget_bytes:
+                os.remove(tmp_path)
+                return None
+            key = f"{Path(input_file).resolve()}|{variant}"
+            name = hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest() + ".mp3"
+            final = self.files_dir / name
+            os.replace(tmp_path, final)
+        except OSError:
+            return None
+        self.put_for_file(input_file, {"file": name, "size": size, "duration": duration}, variant)
+        self.evict()
+        return final
+
+    def remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _forget(self, input_file, variant):
+        entry = self.get_for_file(input_file, variant)
+        path = str(Path(input_file).resolve())
+        self.discard(f"{path}|{variant}")
+        if entry:
+            self.remove_file(self.files_dir / entry["file"])
+
+    def total_bytes(self):
+        with self._lock:
+            self._load()
+            return sum(entry["info"]["size"] for entry in self._entries.values())
+
+    def evict(self):
+        """Borra los intermedios menos usados hasta cumplir el presupuesto."""
+        removed = []
+        with self._lock:
+            self._load()
+            total = sum(entry["info"]["size"] for entry in self._entries.values())
+            for key in list(self._entries):
+                if total <= self.budget_bytes:
+                    break
+                entry = self._entries.pop(key)
+                total -= entry["info"]["size"]
+                removed.append(entry["info"]["file"])
+            if removed:
+                self._save()
+        for name in removed:
+            self.remove_file(self.files_dir / name)
+        return removed
+
+
+_intermediate_cache = None
+_intermediate_cache_lock = threading.Lock()
+
+
+def intermediate_cache():
+    """Instancia compartida de la caché de intermedios."""
+    global _intermediate_cache
+    with _intermediate_cache_lock:
+        if _intermediate_cache is None:
+            _intermediate_cache = IntermediateCache(directory=cache_dir())
+        return _intermediate_cache
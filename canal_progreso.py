@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Canal de progreso con estado coalescido
+- Los motores publican desde sus hilos; solo se guarda el último estado
+  de cada trabajo (tiempo, velocidad, tamaño, fragmento...)
+- Los consumidores (GUI, CLI, lotes) lo muestrean a su propio ritmo, así
+  el coste de actualizar no crece con la frecuencia de FFmpeg
+"""
+
+import threading
+
+
+class ProgressChannel:
+    """Último estado conocido de cada trabajo, seguro entre hilos.
+
+    Cada publicación incrementa una versión global; ``changed_since``
+    devuelve solo los trabajos que cambiaron desde la versión indicada.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def publish(self, job_id, **fields):
+        """Mezcla ``fields`` en el estado del trabajo (no notifica a nadie)."""
+        with self._lock:
+            self._version += 1
+            state = self._states.setdefault(job_id, {"job": job_id})
+            state.update(fields)
+            state["version"] = self._version
+
+    def get(self, job_id):
+        """Copia del estado de un trabajo, o None si nunca publicó."""
+        with self._lock:
+            state = self._states.get(job_id)
+            return dict(state) if state else None
+
+    def snapshot(self):
+        """(versión, {trabajo: estado}) con copias de todos los estados."""
+        with self._lock:
+            return self._version, {job: dict(state) for job, state in self._states.items()}
+
+    def changed_since(self, version):
+        """(versión, [estados]) de los trabajos modificados tras ``version``."""
+        with self._lock:
+            changed = [dict(state) for state in self._states.values() if state["version"] > version]
+            return self._version, changed
+
+    def remove(self, job_id):
+        with self._lock:
+            self._states.pop(job_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Descubrimiento de capacidades de FFmpeg con caché
+- Versión, codificadores, muxers y filtros de ffmpeg; versión de ffprobe
+- Resultados guardados por ruta del ejecutable, tamaño y fecha: los
+  siguientes arranques no lanzan ningún proceso
+- Se puede ejecutar en segundo plano para no retrasar la ventana
+- Comprobación de requisitos de un trabajo (p. ej. libmp3lame, segment)
+"""
+
+import shutil
+import subprocess
+import threading
+
+from cache_audio import FileCache
+
+
+class CapabilityCache(FileCache):
+    """Capacidades por ejecutable; se invalida si el binario cambia."""
+
+    # Se incrementa cuando cambian los campos guardados
+    VERSION = 1
+
+    def __init__(self, max_entries=20, directory=None):
+        super().__init__("capacidades_ffmpeg", max_entries=max_entries, directory=directory)
+
+
+_capability_cache = None
+_capability_lock = threading.Lock()
+
+
+def capability_cache():
+    """Instancia compartida de la caché de capacidades."""
+    global _capability_cache
+    with _capability_lock:
+        if _capability_cache is None:
+            _capability_cache = CapabilityCache()
+        return _capability_cache
+
+
+def _run(cmd, popen_flags):
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15,
+                                **(popen_flags or {}))
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _parse_table(text, name_column=1):
+    """Nombres de una tabla de ``-encoders``/``-muxers`` (tras la línea de guiones)."""
+    if text is None:
+        return None
+    names = set()
+    started = False
+    for line in text.splitlines():
+        if not started:
+            started = line.strip().startswith("--")
+            continue
+        parts = line.split()
+        if len(parts) > name_column:
+            # Algunos muxers comparten línea: "mov,mp4,m4a,3gp,..."
+            names.update(parts[name_column].split(","))
+    return sorted(names)
+
+
+def _parse_filters(text):
+    """Nombres de ``-filters``: líneas con una columna ``entrada->salida``."""
+    if text is None:
+        return None
+    names = set()
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and "->" in parts[2]:
+            names.add(parts[1])
+    return sorted(names)
+
+
+def probe_binary(name, popen_flags=None, use_cache=True):
+    """Capacidades de un ejecutable de FFmpeg, o None si no se encuentra.
+
+    Para ``ffmpeg`` incluye ``encoders``, ``muxers`` y ``filters`` (None si
+    no se pudieron listar, en cuyo caso no se comprueban).
+    """
+    path = shutil.which(name)
+    if not path:
+        return None
+    if use_cache:
+        cached = capability_cache().get_for_file(path)
+        if cached:
+            return cached
+
+    output = _run([path, "-hide_banner", "-version"], popen_flags)
+    if output is None:
+        return None
+    info = {"path": path, "version": output.splitlines()[0] if output else ""}
+    if name == "ffmpeg":
+        info["encoders"] = _parse_table(_run([path, "-hide_banner", "-encoders"], popen_flags))
+        info["muxers"] = _parse_table(_run([path, "-hide_banner", "-muxers"], popen_flags))
+        info["filters"] = _parse_filters(_run([path, "-hide_banner", "-filters"], popen_flags))
+    if use_cache:
+        capability_cache().put_for_file(path, info)
+    return info
+
+
+def probe_capabilities(popen_flags=None, use_cache=True):
+    """``{"ffmpeg": info o None, "ffprobe": info o None}``."""
+    return {
+        "ffmpeg": probe_binary("ffmpeg", popen_flags, use_cache),
+        "ffprobe": probe_binary("ffprobe", popen_flags, use_cache)
+    }
+
+
+def missing_requirements(capabilities, outputs=(), segmenter=True):
+    """Mensajes de error con lo que le falta a FFmpeg para un trabajo.
+
+    ``outputs`` son las salidas del motor (``codec``, ``segment_format``,
+    ``copy``); una salida por copia no necesita codificador.
+    """
+    ffmpeg = capabilities.get("ffmpeg")
+    if ffmpeg is None:
+        return ["FFmpeg no está instalado o no se encuentra en el PATH"]
+    errors = []
+    if capabilities.get("ffprobe") is None:
+        errors.append("FFprobe no está instalado o no se encuentra en el PATH")
+
+    encoders = ffmpeg.get("encoders")
+    muxers = ffmpeg.get("muxers")
+    needed_muxers = {"segment"} if segmenter else set()
+    for output in outputs:
+        needed_muxers.add(output["segment_format"])
+        codec = output["codec"]
+        if output.get("copy") or codec == "copy":
+            continue
+        if encoders is not None and codec not in encoders:
+            errors.append(f"El FFmpeg instalado no tiene el codificador {codec}")
+    if muxers is not None:
+        for muxer in sorted(needed_muxers - set(muxers)):
+            errors.append(f"El FFmpeg instalado no tiene el muxer {muxer}")
+    return errors
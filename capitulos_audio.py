@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+División por capítulos (audiolibros M4A/M4B)
+- Los capítulos llegan en la misma llamada a ffprobe que la duración
+- Un fragmento por capítulo o grupos de capítulos consecutivos que no
+  pasan de una duración máxima (un capítulo más largo se parte en trozos
+  iguales)
+- Devuelve cortes para el segmentador: el archivo se codifica en una pasada
+"""
+
+import math
+
+
+# Cortes más cerca que esto del principio o del final no se usan
+MIN_EDGE = 0.5
+
+
+def parse_chapters(data):
+    """Capítulos de la salida JSON de ffprobe: ``[{"start", "end", "title"}]``."""
+    chapters = []
+    for chapter in data.get("chapters") or []:
+        try:
+            start = float(chapter["start_time"])
+            end = float(chapter["end_time"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        title = (chapter.get("tags") or {}).get("title", "")
+        chapters.append({"start": start, "end": end, "title": title})
+    chapters.sort(key=lambda chapter: chapter["start"])
+    return chapters
+
+
+def chapter_split_points(chapters, duration, max_duration=None):
+    """Cortes (segundos) en el inicio de los capítulos.
+
+    Sin ``max_duration``, uno por capítulo; con él, los capítulos
+    consecutivos se agrupan mientras el grupo no pase de ese máximo.
+    """
+    bounds = sorted({chapter["start"] for chapter in chapters
+                     if MIN_EDGE < chapter["start"] < duration - MIN_EDGE})
+    if not max_duration:
+        return bounds
+
+    points = []
+    group_start = 0.0
+    last_edge = 0.0
+    for edge in bounds + [duration]:
+        if edge - group_start > max_duration and last_edge > group_start:
+            points.append(last_edge)
+            group_start = last_edge
+        if edge - group_start > max_duration:
+            # Capítulo que por sí solo supera el máximo: trozos iguales
+            parts = math.ceil((edge - group_start) / max_duration)
+            step = (edge - group_start) / parts
+            points += [group_start + step * part for part in range(1, parts)]
+            if edge < duration:
+                points.append(edge)
+            group_start = edge
+        last_edge = edge
+    return points
+
+
+def fragment_titles(chapters, ranges):
+    """Títulos de los capítulos que empiezan dentro de cada fragmento."""
+    titles = []
+    for start, end in ranges:
+        names = [chapter["title"] for chapter in chapters
+                 if start - MIN_EDGE <= chapter["start"] < end - MIN_EDGE and chapter["title"]]
+        titles.append(names)
+    return titles
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cola de conversión por lotes
+- Acepta muchos archivos o carpetas completas
+- Ejecuta N trabajos de FFmpeg a la vez (N según núcleos)
+- Planifica primero los trabajos más largos (duración de ffprobe)
+- Informa del rendimiento por trabajo y total (factor de tiempo real)
+- Progreso de todos los trabajos en un único canal coalescido (opcional)
+- Estimación del tamaño total y del espacio libre de cada destino
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import estimacion_espacio
+from motor_conversion import ConversionEngine, get_audio_info, make_output
+
+
+AUDIO_EXTENSIONS = {'.m4a', '.m4b', '.mp3', '.wav', '.flac', '.aac', '.ogg'}
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def collect_inputs(paths, recursive=True):
+    """Expande archivos y carpetas a una lista ordenada de archivos de audio."""
+    files = []
+    seen = set()
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            pattern = "**/*" if recursive else "*"
+            candidates = sorted(p for p in path.glob(pattern)
+                                if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS)
+        elif path.is_file():
+            candidates = [path]
+        else:
+            continue
+        for candidate in candidates:
+            key = candidate.resolve()
+            if key not in seen:
+                seen.add(key)
+                files.append(candidate)
+    return files
+
+
+class BatchQueue:
+    """Ejecuta conversiones en paralelo, las más largas primero.
+
+    Cada trabajo es un dict con las claves ``input``, ``output_dir``,
+    ``duration``, ``status`` (pendiente, procesando, ok, error, cancelado),
+    ``progress``, ``elapsed``, ``speed`` y ``result``.
+
+    Los trabajos son procesos de FFmpeg independientes; los hilos del pool
+    solo los lanzan y leen su progreso, por lo que la concurrencia real es
+    a nivel de proceso.
+    """
+
+    def __init__(self, inputs, output_dir=None, max_jobs=None, engine_options=None,
+                 progress_channel=None, on_job_start=None, on_job_progress=None, on_job_fragment=None,
+                 on_job_done=None, on_log=None):
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.max_jobs = max_jobs or os.cpu_count() or 1
+        self.engine_options = dict(engine_options or {})
+        # En modo paralelo cada trabajo lanza varios FFmpeg: los núcleos se
+        # reparten entre los trabajos simultáneos en vez de multiplicarse
+        if self.engine_options.get("parallel") and not self.engine_options.get("max_workers"):
+            cores = os.cpu_count() or 1
+            self.engine_options["max_workers"] = max(1, cores // self.max_jobs)
+        self.progress_channel = progress_channel
+
+        self.on_job_start = on_job_start or _noop
+        self.on_job_progress = on_job_progress or _noop
+        self.on_job_fragment = on_job_fragment or _noop
+        self.on_job_done = on_job_done or _noop
+        self.on_log = on_log or _noop
+
+        self.jobs = [self.new_job(path) for path in collect_inputs(inputs)]
+        self.is_processing = False
+        self.paused = False
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def new_job(self, input_file):
+        """Dict de trabajo pendiente para ``input_file``."""
+        return {
+            "input": Path(input_file),
+            "output_dir": self.output_dir or Path(input_file).parent,
+            "duration": 0.0,
+            "status": "pendiente",
+            "progress": 0.0,
+            "elapsed": 0.0,
+            "speed": 0.0,
+            "result": None
+        }
+
+    @property
+    def total_duration(self):
+        return sum(job["duration"] for job in self.jobs)
+
+    def aggregate_progress(self):
+        """Progreso global (0-1) ponderado por la duración de cada trabajo."""
+        total = self.total_duration
+        if total <= 0:
+            done = sum(1 for job in self.jobs if job["status"] in ("ok", "error", "cancelado"))
+            return done / len(self.jobs) if self.jobs else 0.0
+        return sum(job["duration"] * job["progress"] for job in self.jobs) / total
+
+    def plan(self):
+        """Obtiene las duraciones y ordena los trabajos, los más largos primero."""
+        for job in self.jobs:
+            info = get_audio_info(job["input"], log=self.on_log)
+            job["duration"] = info["duration"] if info else 0.0
+        self.jobs.sort(key=lambda job: job["duration"], reverse=True)
+        return self.jobs
+
+    def preflight(self):
+        """Estima la salida de todos los trabajos y el espacio libre de cada destino.
+
+        Devuelve una comprobación (ver ``estimacion_espacio.check_space``)
+        por sistema de archivos de destino; cada trabajo guarda su
+        estimación en ``estimated_bytes``.
+        """
+        options = self.engine_options
+        if options.get("outputs"):
+            outputs = options["outputs"]
+        elif options.get("profile"):
+            outputs = [make_output("mp3", profile=options["profile"])]
+        else:
+            outputs = [make_output("mp3", quality=options.get("quality", 2))]
+        chunk_duration = options.get("chunk_duration", 600)
+        targets = {}
+        for job in self.jobs:
+            info = get_audio_info(job["input"], log=self.on_log)
+            if not info:
+                continue
+            ranges = estimacion_espacio.nominal_ranges(info["duration"], chunk_duration)
+            estimate = estimacion_espacio.estimate_output(
+                info, outputs, ranges, stream_copy=options.get("stream_copy", True))
+            job["estimated_bytes"] = estimate["total"]
+            target = targets.setdefault(estimacion_espacio.filesystem_id(job["output_dir"]),
+                                        {"path": job["output_dir"], "estimate": 0})
+            target["estimate"] += estimate["total"]
+        return [estimacion_espacio.check_space(target["path"], target["estimate"])
+                for target in targets.values()]
+
+    def run(self):
+        """Ejecuta todos los trabajos y devuelve un resumen agregado."""
+        start_time = time.time()
+        self.is_processing = True
+
+        if not any(job["duration"] for job in self.jobs):
+            self.plan()
+
+        workers = max(1, min(self.max_jobs, len(self.jobs)))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [pool.submit(self.run_job, job) for job in self.jobs]
+            for future in as_completed(futures):
+                job = future.result()
+                self.on_job_done(job)
+        except BaseException:
+            # Ctrl+C (o un fallo): los pendientes no empiezan y los que
+            # corren se detienen antes de esperar a los hilos
+            self.is_processing = False
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.stop()
+            raise
+        finally:
+            pool.shutdown(wait=True)
+
+        self.is_processing = False
+        elapsed = time.time() - start_time
+        audio_seconds = sum(job["duration"] for job in self.jobs if job["status"] == "ok")
+        failed = [job for job in self.jobs if job["status"] != "ok"]
+
+        return {
+            "ok": not failed,
+            "jobs": len(self.jobs),
+            "completed": len(self.jobs) - len(failed),
+            "failed": len(failed),
+            "elapsed": elapsed,
+            "audio_seconds": audio_seconds,
+            "speed": audio_seconds / elapsed if elapsed > 0 else 0.0
+        }
+
+    def stop(self, graceful=False):
+        """Cancela los trabajos pendientes y detiene los que están en curso.
+
+        Con ``graceful`` los trabajos en curso terminan su fragmento actual
+        (ver ``ConversionEngine.stop``).
+        """
+        self.is_processing = False
+        for engine in self._running_engines():
+            engine.stop(graceful=graceful)
+
+    def pause(self):
+        """Suspende los trabajos en curso; los que empiecen después nacen en pausa."""
+        self.paused = True
+        for engine in self._running_engines():
+            engine.pause()
+
+    def unpause(self):
+        """Reanuda los trabajos en pausa."""
+        self.paused = False
+        for engine in self._running_engines():
+            engine.unpause()
+
+    def _running_engines(self):
+        with self._lock:
+            return list(self._engines.values())
+
+    def run_job(self, job):
+        """Convierte un trabajo en el hilo actual y lo devuelve actualizado."""
+        if not self.is_processing:
+            job["status"] = "cancelado"
+            return job
+
+        job["output_dir"].mkdir(parents=True, exist_ok=True)
+
+        def on_progress(progress, current_time):
+            job["progress"] = progress
+            self.on_job_progress(job, progress)
+
+        engine = ConversionEngine(
+            job["input"],
+            job["output_dir"],
+            total_duration=job["duration"],
+            on_progress=on_progress,
+            on_fragment=lambda current, total: self.on_job_fragment(job, current, total),
+            progress_channel=self.progress_channel,
+            job_id=str(job["input"]),
+            on_log=lambda message: self.on_log(f"[{job['input'].name}] {message}"),
+            **self.engine_options
+        )
+        with self._lock:
+            self._engines[id(job)] = engine
+            if self.paused:
+                engine.pause()
+
+        job["status"] = "procesando"
+        self.on_job_start(job)
+        try:
+            result = engine.run()
+        except Exception as e:
+            result = {"ok": False, "cancelled": False, "message": str(e),
+                      "elapsed": 0.0, "files": []}
+        finally:
+            with self._lock:
+                self._engines.pop(id(job), None)
+
+        job["result"] = result
+        job["elapsed"] = result["elapsed"]
+        if result["ok"]:
+            job["status"] = "ok"
+            job["progress"] = 1.0
+            job["speed"] = job["duration"] / result["elapsed"] if result["elapsed"] > 0 else 0.0
+        else:
+            job["status"] = "cancelado" if result["cancelled"] else "error"
+        return job
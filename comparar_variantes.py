@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Comparación de rendimiento y corrección entre las variantes del conversor
+- Ejecuta el ``run_conversion`` de cada script sin ventana (raíz simulada)
+- Mismas entradas para todas; cada variante escribe en su propia carpeta
+- Compara tiempo, velocidad, tamaño de salida, número de fragmentos y
+  deriva de duración (suma de fragmentos frente a la entrada)
+- Opcionalmente prueba nombres problemáticos (espacios, %, comillas)
+
+Uso:
+    python comparar_variantes.py entrada.m4a [más entradas...] -m 10 -o informe.json
+"""
+
+import argparse
+import importlib
+import json
+import math
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from motor_conversion import get_audio_info
+
+
+DEFAULT_VARIANTS = ["conversor_audio", "conversor_audio12", "conversor_audio_mejorado"]
+
+# Nombre con los caracteres que rompen el patrón del segmentador sin sanear
+AWKWARD_NAME = "prueba 100% \"comillas\" [v2]"
+
+# Deriva máxima (segundos) para dar por correcta la suma de fragmentos
+DURATION_TOLERANCE = 1.0
+
+
+class StubRoot:
+    """Sustituto de ``tk.Tk`` para ``root.after``: ejecuta al momento lo
+    programado sin demora y descarta los temporizadores periódicos."""
+
+    def after(self, delay, callback=None, *args):
+        if delay == 0 and callback is not None:
+            callback(*args)
+
+
+def _silent(*args, **kwargs):
+    pass
+
+
+def make_headless(module, input_file, output_dir, chunk_duration, total_duration):
+    """Crea la ventana de una variante sin tkinter y captura su resultado.
+
+    Se evita ``__init__`` (que construye los widgets) y se fijan solo los
+    atributos que usa ``run_conversion``; los métodos que tocan widgets se
+    sustituyen por capturas en la propia instancia.
+    """
+    gui = module.AudioConverterGUI.__new__(module.AudioConverterGUI)
+    outcome = {"ok": None, "message": "", "progress_samples": 0}
+
+    def complete(message, files=None):
+        outcome.update(ok=True, message=message)
+
+    def error(message):
+        outcome.update(ok=False, message=message)
+
+    def progress(value):
+        outcome["progress_samples"] += 1
+
+    gui.root = StubRoot()
+    gui.os_name = platform.system()
+    gui.input_file = Path(input_file)
+    gui.input_files = [gui.input_file]
+    gui.output_dir = Path(output_dir)
+    gui.chunk_duration = chunk_duration
+    gui.total_duration = total_duration
+    gui.current_progress = 0
+    gui.current_time = 0
+    gui.start_time = time.time()
+    gui.is_processing = True
+    gui.ffmpeg_process = None
+    gui._last_base_name = None
+    gui.log = _silent
+    gui.conversion_complete = complete
+    gui.conversion_error = error
+    gui.update_progress_ui = progress
+
+    # La variante mejorada delega en el motor: se prepara como en start_conversion
+    if hasattr(module, "ConversionEngine"):
+        gui.engine = module.ConversionEngine(
+            gui.input_file,
+            gui.output_dir,
+            chunk_duration=chunk_duration,
+            total_duration=total_duration,
+            resume=False,
+            intermediate_cache=False,
+            conversion_cache=False,
+            on_log=_silent
+        )
+    return gui, outcome
+
+
+def probe_duration(path):
+    info = get_audio_info(path, use_cache=False)
+    return info["duration"] if info else 0.0
+
+
+def run_variant(name, input_file, chunk_duration, total_duration, work_dir):
+    """Ejecuta una variante sobre una entrada y mide su salida."""
+    module = importlib.import_module(name)
+    output_dir = Path(work_dir) / name
+    shutil.rmtree(output_dir, ignore_errors=True)
+    output_dir.mkdir(parents=True)
+
+    gui, outcome = make_headless(module, input_file, output_dir, chunk_duration, total_duration)
+    start = time.perf_counter()
+    try:
+        gui.run_conversion()
+    except Exception as e:
+        outcome.update(ok=False, message=f"Excepción: {e}")
+    wall = time.perf_counter() - start
+
+    files = sorted(output_dir.glob("*.mp3"))
+    durations = [probe_duration(path) for path in files]
+    expected = math.ceil(total_duration / chunk_duration) if total_duration > 0 else None
+    drift = sum(durations) - total_duration
+    # Los fragmentos completos deben durar chunk_duration; el último, lo que quede
+    fragment_drift = max((abs(d - chunk_duration) for d in durations[:-1]), default=0.0)
+
+    return {
+        "variant": name,
+        "ok": bool(outcome["ok"]),
+        "message": outcome["message"],
+        "wall": wall,
+        "speed": total_duration / wall if wall > 0 and outcome["ok"] else 0.0,
+        "progress_samples": outcome["progress_samples"],
+        "segments": len(files),
+        "expected_segments": expected,
+        "output_bytes": sum(path.stat().st_size for path in files),
+        "segment_sizes": [path.stat().st_size for path in files],
+        "duration_drift": drift,
+        "max_fragment_drift": fragment_drift,
+        "correct": bool(outcome["ok"]) and len(files) == expected
+                   and abs(drift) <= DURATION_TOLERANCE,
+        "names": [path.name for path in files[:3]]
+    }
+
+
+def compare_inputs(inputs, variants, chunk_duration, repeat=1, awkward_names=False, log=print):
+    results = []
+    work_dir = Path(tempfile.mkdtemp(prefix="variantes_"))
+    try:
+        for input_file in inputs:
+            input_file = Path(input_file)
+            if awkward_names:
+                renamed = work_dir / "entradas" / f"{AWKWARD_NAME}{input_file.suffix}"
+                renamed.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(input_file, renamed)
+                input_file = renamed
+            total_duration = probe_duration(input_file)
+            for name in variants:
+                runs = [run_variant(name, input_file, chunk_duration, total_duration, work_dir)
+                        for _ in range(repeat)]
+                runs.sort(key=lambda run: run["wall"])
+                entry = dict(runs[len(runs) // 2], input=str(input_file),
+                             duration=total_duration, runs=len(runs))
+                results.append(entry)
+                status = "OK" if entry["correct"] else "INCORRECTO"
+                log(f"{input_file.name} · {name}: {entry['wall']:.2f}s, {entry['speed']:.1f}x, "
+                    f"{entry['segments']} fragmentos, deriva {entry['duration_drift']:+.2f}s, {status}"
+                    + ("" if entry["ok"] else f" ({entry['message']})"))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def summarize(results):
+    """Por variante: tiempo total, velocidad media y entradas correctas."""
+    summary = {}
+    for entry in results:
+        stats = summary.setdefault(entry["variant"], {"wall": 0.0, "audio_seconds": 0.0,
+                                                      "correct": 0, "inputs": 0})
+        stats["inputs"] += 1
+        stats["correct"] += int(entry["correct"])
+        if entry["ok"]:
+            stats["wall"] += entry["wall"]
+            stats["audio_seconds"] += entry["duration"]
+    for stats in summary.values():
+        stats["speed"] = stats["audio_seconds"] / stats["wall"] if stats["wall"] > 0 else 0.0
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compara las variantes del conversor sobre las mismas entradas (sin GUI)."
+    )
+    parser.add_argument("inputs", nargs="+", type=Path, help="Archivos de audio de prueba")
+    parser.add_argument("-m", "--minutes", type=float, default=10,
+                        help="Minutos por fragmento (por defecto: %(default)s)")
+    parser.add_argument("--variants", nargs="+", default=DEFAULT_VARIANTS,
+                        help="Módulos a comparar (por defecto: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Repeticiones por variante; se usa la mediana (por defecto: %(default)s)")
+    parser.add_argument("--awkward-names", action="store_true",
+                        help="Copiar cada entrada con un nombre con espacios, %% y comillas")
+    parser.add_argument("-o", "--output", type=Path, default=None,
+                        help="Guardar el informe JSON en este archivo")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = compare_inputs(args.inputs, args.variants, args.minutes * 60,
+                             repeat=args.repeat, awkward_names=args.awkward_names,
+                             log=lambda message: print(message, file=sys.stderr))
+    report = {"chunk_duration": args.minutes * 60, "results": results,
+              "summary": summarize(results)}
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0 if all(entry["correct"] for entry in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
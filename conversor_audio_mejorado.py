@@ -6,27 +6,55 @@ VERSIÓN OPTIMIZADA CON MEJORAS 2 Y 3
 - Compatible con Windows/Linux/macOS
 - Progreso por archivo (MEJORA 2)
 - Duración personalizable (MEJORA 3)
+- Modo paralelo por fragmentos (MEJORA 4)
+- Lógica de conversión en motor_conversion.py (sin tkinter)
+- Cola por lotes: varios archivos o carpetas completas (MEJORA 5)
+- Salida M4A sin recodificar (MEJORA 6)
+- Cortes en silencios cercanos (MEJORA 7)
+- Registro por lotes sin bloquear la interfaz (MEJORA 8)
+- Progreso muestreado a ritmo fijo desde un canal coalescido (MEJORA 9)
+- Reanudación de trabajos interrumpidos por fragmentos (MEJORA 10)
+- Estimación del tamaño de salida y del espacio libre antes de empezar (MEJORA 11)
+- Capacidades de FFmpeg comprobadas en segundo plano y cacheadas (MEJORA 12)
+- Perfiles de codificación MP3 y elección automática por muestra (MEJORA 13)
+- División por tamaño máximo de fragmento en una sola pasada (MEJORA 14)
+- Cortes por capítulos en audiolibros M4A/M4B (MEJORA 15)
+- Detención sin bloquear la ventana, parada limpia y pausa (MEJORA 16)
 """
 
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
 import subprocess
 import threading
-import json
 import math
 import time
-import re
 import os
 import platform
 from pathlib import Path
-from datetime import datetime
+
+import analisis_silencios
+import capitulos_audio
+import estimacion_espacio
+import perfiles_codificacion
+from cache_audio import cache_dir
+from canal_progreso import ProgressChannel
+from cola_conversion import BatchQueue, collect_inputs
+import capacidades_ffmpeg
+from motor_conversion import (ConversionEngine, check_dependencies, ffmpeg_capabilities,
+                              get_audio_info, make_output)
+from registro_actividad import LogBuffer
 
 
 class AudioConverterGUI:
+    LOG_FLUSH_MS = 250         # Frecuencia de volcado del registro a la consola
+    LOG_BATCH_LINES = 500      # Líneas retenidas entre dos volcados
+    LOG_MAX_LINES = 2000       # Líneas visibles como máximo en la consola
+    PROGRESS_SAMPLE_MS = 100   # Muestreo del progreso (10 actualizaciones/s)
+    
     def __init__(self, root):
         self.root = root
         self.root.title("🎶 Conversor M4A → MP3 - ¡A toda máquina! 🚀")
-        self.root.geometry("850x925")
+        self.root.geometry("850x1150")
         self.root.resizable(True, True)
         
         # --- CONFIGURACIÓN DE ENTORNO ---
@@ -42,23 +70,100 @@ class AudioConverterGUI:
         
         # Variables principales
         self.input_file = None
+        self.input_files = []
         self.output_dir = None
         self.total_duration = 0
         self.current_progress = 0
         self.current_time = 0
         self.start_time = None
         self.is_processing = False
-        self.ffmpeg_process = None
-        self._last_base_name = None
+        self.engine = None
+        self.batch_queue = None
+        
+        # --- MEJORA 9: Canal de progreso (último estado por trabajo) ---
+        self.progress_channel = ProgressChannel()
+        self._progress_version = 0
+        self._last_fragment = None
         
         # --- MEJORA 3: Variable para duración personalizable ---
         self.chunk_duration_var = tk.IntVar(value=10)  # Minutos por defecto
         self.chunk_duration = 600  # Segundos (se actualizará)
         
+        # --- MEJORA 4: Modo paralelo (un ffmpeg por fragmento) ---
+        self.parallel_var = tk.BooleanVar(value=False)
+        self.max_workers = os.cpu_count() or 1
+        
+        # --- MEJORA 6: Formato de salida (MP3 o M4A por copia) ---
+        self.output_formats = {
+            "MP3": "mp3",
+            "M4A (sin recodificar)": "m4a"
+        }
+        self.output_format_var = tk.StringVar(value="MP3")
+        
+        # --- MEJORA 13: Perfil de codificación MP3 ---
+        self.profiles = {
+            f"{settings['label']} ({name})": name
+            for name, settings in perfiles_codificacion.PROFILES.items()
+        }
+        self.profiles[f"Automático (el más rápido ≤ {perfiles_codificacion.DEFAULT_TARGET_KBPS} kbps)"] = \
+            perfiles_codificacion.AUTO
+        self.profile_var = tk.StringVar(value=next(iter(self.profiles)))
+        
+        # --- MEJORA 14: Tamaño máximo por fragmento (en bytes) ---
+        self.max_sizes = {
+            "Sin límite (cortar por minutos)": None,
+            "10 MB": 10_000_000,
+            "25 MB": 25_000_000,
+            "50 MB": 50_000_000,
+            "100 MB": 100_000_000
+        }
+        self.max_size_var = tk.StringVar(value=next(iter(self.max_sizes)))
+        
+        # --- MEJORA 15: Cortes por capítulos ---
+        self.chapter_modes = {
+            "No usar capítulos": None,
+            "Un fragmento por capítulo": "each",
+            "Agrupar capítulos hasta los minutos elegidos": "group"
+        }
+        self.chapter_mode_var = tk.StringVar(value=next(iter(self.chapter_modes)))
+        
+        # --- MEJORA 16: Pausa y parada limpia ---
+        # El primer clic en DETENER termina el fragmento en curso; el segundo
+        # detiene en el acto. El tiempo en pausa no cuenta para velocidad/ETA.
+        self.is_paused = False
+        self.stop_requested = False
+        self.paused_seconds = 0.0
+        self.pause_started = None
+        
+        # --- MEJORA 7: Cortar en silencios (requiere NumPy) ---
+        self.silence_var = tk.BooleanVar(value=False)
+        
+        # --- MEJORA 10: Reanudar trabajos interrumpidos ---
+        self.resume_var = tk.BooleanVar(value=True)
+        
+        # --- MEJORA 8: Registro en búfer, volcado a la consola por lotes ---
+        self.log_buffer = LogBuffer(max_lines=self.LOG_BATCH_LINES,
+                                    log_file=self.log_buffer_path())
+        
         self.setup_ui()
+        self.flush_logs()
         
-        # Verificar dependencias completas
-        if not self.check_dependencies():
+        # --- MEJORA 12: Dependencias y capacidades de FFmpeg en segundo plano ---
+        # La ventana aparece al momento; el resultado llega por root.after
+        self.capabilities = None
+        threading.Thread(target=self.probe_capabilities, daemon=True).start()
+    
+    def probe_capabilities(self):
+        """Consulta (o lee de la caché) las capacidades de FFmpeg; corre en un hilo."""
+        start = time.perf_counter()
+        check_dependencies()  # Registra el tiempo para los informes de trabajo
+        capabilities = ffmpeg_capabilities()
+        self.root.after(0, self.on_capabilities, capabilities, time.perf_counter() - start)
+    
+    def on_capabilities(self, capabilities, elapsed):
+        """Muestra el resultado de la comprobación de FFmpeg (hilo de la interfaz)."""
+        self.capabilities = capabilities
+        if capabilities["ffmpeg"] is None or capabilities["ffprobe"] is None:
             msg = "FFmpeg o FFprobe no están instalados o no se encuentran en el PATH.\n\n"
             if self.os_name == "Windows":
                 msg += "Descárgalos de ffmpeg.org y añádelos a tus variables de entorno."
@@ -67,26 +172,15 @@ class AudioConverterGUI:
             
             messagebox.showerror("Error Crítico de Dependencias", msg)
             self.root.quit()
+            return
+        
+        self.log(f"🔧 {capabilities['ffmpeg']['version']} ({elapsed:.2f}s)")
+        for message in capacidades_ffmpeg.missing_requirements(capabilities, [make_output("mp3")]):
+            self.log(f"⚠️ {message}")
     
     def check_dependencies(self):
         """Verifica que ffmpeg y ffprobe estén instalados."""
-        cmds = (['ffmpeg', '-version'], ['ffprobe', '-version'])
-        for cmd in cmds:
-            try:
-                kwargs = {'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
-                if self.os_name == "Windows":
-                    kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
-                subprocess.run(cmd, check=True, **kwargs)
-            except FileNotFoundError:
-                self.log(f"Dependencia no encontrada: {cmd[0]}")
-                return False
-            except subprocess.CalledProcessError as e:
-                self.log(f"Error ejecutando {cmd[0]}: {e}")
-                return False
-            except Exception as e:
-                self.log(f"Error comprobando {cmd[0]}: {e}")
-                return False
-        return True
+        return check_dependencies(log=self.log)
     
     def setup_ui(self):
         """Configura la interfaz optimizada con mejoras."""
@@ -128,6 +222,11 @@ class AudioConverterGUI:
             row=0, column=2, padx=5
         )
         
+        # --- MEJORA 5: Carpeta completa para conversión por lotes ---
+        ttk.Button(file_frame, text="Carpeta...", command=self.select_input_dir).grid(
+            row=0, column=3, padx=5
+        )
+        
         # DIRECTORIO DE SALIDA
         output_frame = ttk.LabelFrame(main_frame, text="📂 Directorio de salida", padding="10")
         output_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
@@ -172,6 +271,85 @@ class AudioConverterGUI:
             row=0, column=2, padx=10
         )
         
+        # --- MEJORA 4: MODO PARALELO ---
+        ttk.Checkbutton(
+            duration_frame,
+            text=f"⚡ Modo paralelo ({self.max_workers} núcleos)",
+            variable=self.parallel_var
+        ).grid(row=1, column=0, columnspan=3, sticky=tk.W, padx=5, pady=(5, 0))
+        
+        # --- MEJORA 6: FORMATO DE SALIDA ---
+        ttk.Label(duration_frame, text="Formato de salida:", font=(self.main_font, 12)).grid(
+            row=2, column=0, padx=5, pady=(5, 0)
+        )
+        ttk.Combobox(
+            duration_frame,
+            values=list(self.output_formats),
+            textvariable=self.output_format_var,
+            state='readonly',
+            width=22,
+            font=(self.main_font, 11)
+        ).grid(row=2, column=1, columnspan=2, sticky=tk.W, padx=5, pady=(5, 0))
+        
+        # --- MEJORA 7: CORTES EN SILENCIOS ---
+        silence_text = "🤫 Ajustar cortes al silencio más cercano"
+        if not analisis_silencios.numpy_available():
+            silence_text += " (requiere NumPy)"
+        ttk.Checkbutton(
+            duration_frame,
+            text=silence_text,
+            variable=self.silence_var,
+            state='normal' if analisis_silencios.numpy_available() else 'disabled'
+        ).grid(row=3, column=0, columnspan=3, sticky=tk.W, padx=5, pady=(5, 0))
+        
+        # --- MEJORA 10: REANUDACIÓN ---
+        ttk.Checkbutton(
+            duration_frame,
+            text="♻️ Reanudar: conservar fragmentos ya terminados",
+            variable=self.resume_var
+        ).grid(row=4, column=0, columnspan=3, sticky=tk.W, padx=5, pady=(5, 0))
+        
+        # --- MEJORA 13: PERFIL DE CODIFICACIÓN ---
+        ttk.Label(duration_frame, text="Perfil MP3:", font=(self.main_font, 12)).grid(
+            row=5, column=0, padx=5, pady=(5, 0)
+        )
+        ttk.Combobox(
+            duration_frame,
+            values=list(self.profiles),
+            textvariable=self.profile_var,
+            state='readonly',
+            width=40,
+            font=(self.main_font, 11)
+        ).grid(row=5, column=1, columnspan=2, sticky=tk.W, padx=5, pady=(5, 0))
+        
+        # --- MEJORA 14: TAMAÑO MÁXIMO POR FRAGMENTO ---
+        ttk.Label(duration_frame, text="Tamaño máximo:", font=(self.main_font, 12)).grid(
+            row=6, column=0, padx=5, pady=(5, 0)
+        )
+        ttk.Combobox(
+            duration_frame,
+            values=list(self.max_sizes),
+            textvariable=self.max_size_var,
+            state='readonly',
+            width=40,
+            font=(self.main_font, 11)
+        ).grid(row=6, column=1, columnspan=2, sticky=tk.W, padx=5, pady=(5, 0))
+        
+        # --- MEJORA 15: CAPÍTULOS ---
+        ttk.Label(duration_frame, text="Capítulos:", font=(self.main_font, 12)).grid(
+            row=7, column=0, padx=5, pady=(5, 0)
+        )
+        chapter_combo = ttk.Combobox(
+            duration_frame,
+            values=list(self.chapter_modes),
+            textvariable=self.chapter_mode_var,
+            state='readonly',
+            width=40,
+            font=(self.main_font, 11)
+        )
+        chapter_combo.grid(row=7, column=1, columnspan=2, sticky=tk.W, padx=5, pady=(5, 0))
+        self.chapter_mode_var.trace('w', self.on_duration_change)
+        
         # INFORMACIÓN DEL ARCHIVO
         self.info_frame = ttk.LabelFrame(main_frame, text="🔎 Información del archivo", padding="10")
         self.info_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
@@ -280,38 +458,66 @@ class AudioConverterGUI:
         )
         self.stop_button.grid(row=0, column=1, padx=5, ipadx=20, ipady=4)
         
+        # --- MEJORA 16: BOTÓN DE PAUSA ---
+        self.pause_button = ttk.Button(
+            button_frame,
+            text="⏯️ PAUSAR",
+            command=self.toggle_pause,
+            state='disabled'
+        )
+        self.pause_button.grid(row=0, column=2, padx=5, ipadx=15, ipady=4)
+        
         self.open_button = ttk.Button(
             button_frame,
             text="📂 ABRIR CARPETA",
             command=self.open_output_folder,
             state='disabled'
         )
-        self.open_button.grid(row=0, column=2, padx=5, ipadx=20, ipady=4)
+        self.open_button.grid(row=0, column=3, padx=5, ipadx=20, ipady=4)
         
         ttk.Button(
             button_frame,
             text="🗑️ LIMPIAR",
             command=self.clear_logs
-        ).grid(row=0, column=3, padx=5, ipadx=15, ipady=4)
+        ).grid(row=0, column=4, padx=5, ipadx=15, ipady=4)
         
         ttk.Button(
             button_frame,
             text="❌ SALIR",
             command=self.root.quit
-        ).grid(row=0, column=4, padx=5, ipadx=15, ipady=4)
+        ).grid(row=0, column=5, padx=5, ipadx=15, ipady=4)
     
     def log(self, message):
-        """Añade mensaje a la consola con timestamp."""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        try:
-            self.root.update_idletasks()
-        except Exception:
-            pass
+        """Añade mensaje al registro con timestamp (seguro desde cualquier hilo).
+        
+        MEJORA 8: la consola se actualiza por lotes en flush_logs.
+        """
+        self.log_buffer.write(message)
+    
+    def flush_logs(self):
+        """MEJORA 8: Vuelca el búfer de registro a la consola en un solo insert."""
+        lines, dropped = self.log_buffer.drain()
+        if lines:
+            text = ""
+            if dropped:
+                text = f"... {dropped} líneas omitidas (registro completo en {self.log_buffer_path()})\n"
+            text += "\n".join(lines) + "\n"
+            self.log_text.insert(tk.END, text)
+            
+            # Limitar las líneas retenidas en el widget
+            excess = int(self.log_text.index('end-1c').split('.')[0]) - self.LOG_MAX_LINES
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.see(tk.END)
+        
+        self.root.after(self.LOG_FLUSH_MS, self.flush_logs)
+    
+    def log_buffer_path(self):
+        return cache_dir() / "conversor_gui.log"
     
     def clear_logs(self):
         """Limpia la consola."""
+        self.log_buffer.clear()
         self.log_text.delete("1.0", tk.END)
     
     def _guess_desktop(self):
@@ -332,25 +538,47 @@ class AudioConverterGUI:
         
         initial_dir = self._guess_desktop()
         
-        file_path = filedialog.askopenfilename(
-            title="Seleccionar archivo de audio",
+        file_paths = filedialog.askopenfilenames(
+            title="Seleccionar archivos de audio",
             initialdir=initial_dir,
             filetypes=filetypes
         )
         
-        if file_path:
-            self.input_file = Path(file_path)
-            self.input_entry.delete(0, tk.END)
+        if file_paths:
+            self.set_input_files([Path(p) for p in file_paths])
+    
+    def select_input_dir(self):
+        """MEJORA 5: Selecciona una carpeta y añade todos sus archivos de audio."""
+        dir_path = filedialog.askdirectory(
+            title="Seleccionar carpeta con audios",
+            initialdir=self._guess_desktop()
+        )
+        
+        if dir_path:
+            files = collect_inputs([dir_path])
+            if not files:
+                messagebox.showwarning("Aviso", "La carpeta no contiene archivos de audio.")
+                return
+            self.set_input_files(files)
+    
+    def set_input_files(self, files):
+        """Establece uno o varios archivos de entrada y actualiza la interfaz."""
+        self.input_files = list(files)
+        self.input_file = self.input_files[0]
+        self.input_entry.delete(0, tk.END)
+        if len(self.input_files) == 1:
             self.input_entry.insert(0, str(self.input_file))
-            
-            # Actualizar info y habilitar botón
-            self.update_file_info()
-            self.convert_button.configure(state='normal')
-            
-            # Establecer directorio de salida por defecto
-            if not self.output_entry.get():
-                self.output_entry.delete(0, tk.END)
-                self.output_entry.insert(0, str(self.input_file.parent))
+        else:
+            self.input_entry.insert(0, f"{len(self.input_files)} archivos ({self.input_file.parent})")
+        
+        # Actualizar info y habilitar botón
+        self.update_file_info()
+        self.convert_button.configure(state='normal')
+        
+        # Establecer directorio de salida por defecto
+        if not self.output_entry.get():
+            self.output_entry.delete(0, tk.END)
+            self.output_entry.insert(0, str(self.input_file.parent))
     
     def select_output_dir(self):
         """Selecciona directorio de salida."""
@@ -371,47 +599,14 @@ class AudioConverterGUI:
     
     def get_audio_info(self):
         """Obtiene información del audio usando ffprobe."""
-        cmd = [
-            'ffprobe', '-v', 'error',
-            '-select_streams', 'a:0',
-            '-show_entries', 'format=duration,size,bit_rate',
-            '-of', 'json',
-            str(self.input_file)
-        ]
-        
-        try:
-            kwargs = {'capture_output': True, 'text': True, 'check': True}
-            if self.os_name == "Windows":
-                kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
-            
-            result = subprocess.run(cmd, timeout=15, **kwargs)
-            if not result.stdout:
-                raise ValueError("ffprobe no devolvió datos")
-            
-            data = json.loads(result.stdout)
-            fmt = data.get("format")
-            if not fmt:
-                raise ValueError("ffprobe no devolvió la sección 'format'")
-            
-            duration = float(fmt.get("duration", 0.0))
-            size = int(fmt.get("size", 0))
-            bitrate = int(fmt.get("bit_rate", 0) or 0)
-            
-            return {
-                "duration": duration,
-                "size": size,
-                "bitrate": bitrate,
-                "size_mb": size / (1024 * 1024) if size else 0.0
-            }
-        except subprocess.TimeoutExpired:
-            self.log("ffprobe tardó demasiado al obtener información.")
-            return None
-        except Exception as e:
-            self.log(f"❌ Error obteniendo info con FFprobe: {e}")
-            return None
+        return get_audio_info(self.input_file, log=self.log)
     
     def update_file_info(self):
         """Actualiza información del archivo."""
+        if len(self.input_files) > 1:
+            self.update_batch_info()
+            return
+        
         if not self.input_file or not self.input_file.exists():
             return
         
@@ -428,12 +623,28 @@ class AudioConverterGUI:
         chunk_minutes = self.chunk_duration_var.get()
         chunk_seconds = chunk_minutes * 60
         chunks = math.ceil(duration / chunk_seconds)
+        fragments_text = f"{chunks} archivos de {chunk_minutes} minutos"
+        
+        # --- MEJORA 15: Fragmentos según los capítulos ---
+        chapters = info.get("chapters") or []
+        chapter_mode = self.chapter_modes[self.chapter_mode_var.get()]
+        if chapter_mode and len(chapters) > 1:
+            max_duration = chunk_seconds if chapter_mode == "group" else None
+            points = capitulos_audio.chapter_split_points(chapters, duration, max_duration)
+            fragments_text = f"{len(points) + 1} archivos ({len(chapters)} capítulos)"
+        elif chapters:
+            fragments_text += f" · {len(chapters)} capítulos"
         
         info_text = f"""Archivo: {self.input_file.name}
 Duración: {hours:02d}:{minutes:02d}:{seconds:02d} ({duration:.0f} segundos)
 Tamaño: {info['size_mb']:.1f} MB
-Fragmentos: {chunks} archivos de {chunk_minutes} minutos
-Bitrate detectado: {info['bitrate'] // 1000 if info['bitrate'] else 'Desconocido'} kbps"""
+Fragmentos: {fragments_text}
+Bitrate detectado: {info['bitrate'] // 1000 if info['bitrate'] else 'Desconocido'} kbps ({info.get('codec') or '?'})"""
+        
+        # --- MEJORA 11: Tamaño estimado de la salida ---
+        check = self.estimate_space(info)
+        info_text += (f"\nSalida estimada: ~{estimacion_espacio.format_bytes(check['estimate'])} "
+                      f"({estimacion_espacio.format_bytes(check['free'])} libres)")
         
         self.info_text.configure(state='normal')
         self.info_text.delete("1.0", tk.END)
@@ -442,13 +653,61 @@ Bitrate detectado: {info['bitrate'] // 1000 if info['bitrate'] else 'Desconocido
         
         self.total_duration = duration
     
+    def selected_output_dir(self):
+        """Carpeta de salida elegida o, si no hay, la del archivo de entrada."""
+        return Path(self.output_entry.get()) if self.output_entry.get() else self.input_file.parent
+    
+    def selected_outputs(self):
+        """MEJORA 13: Salida elegida; el perfil solo se aplica a MP3."""
+        fmt = self.output_formats[self.output_format_var.get()]
+        if fmt == "mp3":
+            return [make_output(fmt, profile=self.profiles[self.profile_var.get()])]
+        return [make_output(fmt)]
+    
+    def estimate_space(self, info):
+        """MEJORA 11: Estima la salida del archivo actual y el espacio libre del destino."""
+        outputs = self.selected_outputs()
+        ranges = estimacion_espacio.nominal_ranges(info["duration"], self.chunk_duration_var.get() * 60)
+        estimate = estimacion_espacio.estimate_output(info, outputs, ranges)
+        return estimacion_espacio.check_space(self.selected_output_dir(), estimate["total"])
+    
+    def update_batch_info(self):
+        """MEJORA 5: Muestra el resumen de la cola por lotes."""
+        names = ", ".join(f.name for f in self.input_files[:3])
+        if len(self.input_files) > 3:
+            names += f" y {len(self.input_files) - 3} más"
+        
+        info_text = f"""Lote: {len(self.input_files)} archivos
+Archivos: {names}
+Fragmentos: {self.chunk_duration_var.get()} minutos por archivo
+Trabajos simultáneos: {self.max_workers}
+Se convierten primero los archivos más largos"""
+        
+        self.info_text.configure(state='normal')
+        self.info_text.delete("1.0", tk.END)
+        self.info_text.insert("1.0", info_text)
+        self.info_text.configure(state='disabled')
+    
     def start_conversion(self):
         """Inicia conversión."""
         if not self.input_file or not self.input_file.exists():
             messagebox.showerror("Error", "Selecciona un archivo válido.")
             return
         
-        output_dir = Path(self.output_entry.get()) if self.output_entry.get() else self.input_file.parent
+        output_dir = self.selected_output_dir()
+        
+        # --- MEJORA 11: Comprobar el espacio antes de gastar CPU ---
+        info = self.get_audio_info() if len(self.input_files) <= 1 else None
+        if info:
+            check = self.estimate_space(info)
+            message = estimacion_espacio.space_message(check)
+            if check["status"] == "insuficiente":
+                messagebox.showerror("Espacio insuficiente", message)
+                return
+            if check["status"] == "justo" and not messagebox.askyesno(
+                    "Espacio justo", f"{message}\n\n¿Convertir de todos modos?"):
+                return
+        
         output_dir.mkdir(parents=True, exist_ok=True)
         self.output_dir = output_dir
         
@@ -456,173 +715,191 @@ Bitrate detectado: {info['bitrate'] // 1000 if info['bitrate'] else 'Desconocido
         self.chunk_duration = self.chunk_duration_var.get() * 60
         
         self.convert_button.configure(state='disabled')
-        self.stop_button.configure(state='normal')
+        self.stop_button.configure(state='normal', text="⏸️ DETENER")
+        self.pause_button.configure(state='normal', text="⏯️ PAUSAR")
         self.open_button.configure(state='disabled')
         
         self.current_progress = 0
         self.current_time = 0
         self.start_time = time.time()
         self.is_processing = True
+        self.is_paused = False
+        self.stop_requested = False
+        self.paused_seconds = 0.0
+        self.pause_started = None
         
         self.clear_logs()
         self.log("=" * 70)
         self.log("🚀 INICIANDO CONVERSIÓN TURBO")
         self.log(f"📄 Archivo: {self.input_file.name}")
         self.log(f"📂 Salida: {self.output_dir}")
-        self.log(f"⏱️  Fragmentos: {self.chunk_duration_var.get()} minutos cada uno")
+        if self.max_sizes[self.max_size_var.get()]:
+            self.log(f"📦 Fragmentos: como mucho {self.max_size_var.get()} cada uno")
+        else:
+            self.log(f"⏱️  Fragmentos: {self.chunk_duration_var.get()} minutos cada uno")
+        self.log(f"🎼 Formato: {self.output_format_var.get()}")
+        if self.output_formats[self.output_format_var.get()] == "mp3":
+            self.log(f"🎚️ Perfil: {self.profile_var.get()}")
+        if self.parallel_var.get():
+            self.log(f"⚡ Modo paralelo: hasta {self.max_workers} procesos FFmpeg")
         self.log("=" * 70)
         
-        thread = threading.Thread(target=self.run_conversion, daemon=True)
+        engine_options = {
+            "chunk_duration": self.chunk_duration,
+            "parallel": self.parallel_var.get(),
+            "silence_split": self.silence_var.get(),
+            "resume": self.resume_var.get(),
+            "outputs": self.selected_outputs(),
+            "max_fragment_bytes": self.max_sizes[self.max_size_var.get()],
+            "chapter_split": self.chapter_modes[self.chapter_mode_var.get()]
+        }
+        
+        self.progress_channel.clear()
+        self._progress_version = self.progress_channel.version
+        self._last_fragment = None
+        
+        self.engine = ConversionEngine(
+            self.input_file,
+            self.output_dir,
+            max_workers=self.max_workers,
+            total_duration=self.total_duration,
+            progress_channel=self.progress_channel,
+            on_log=self.log,
+            **engine_options
+        )
+        self.batch_queue = None
+        
+        target = self.run_conversion
+        if len(self.input_files) > 1:
+            self.log(f"📚 Lote: {len(self.input_files)} archivos, {self.max_workers} a la vez")
+            self.engine = None
+            self.batch_queue = BatchQueue(
+                self.input_files,
+                output_dir=self.output_dir,
+                max_jobs=self.max_workers,
+                engine_options=engine_options,
+                progress_channel=self.progress_channel,
+                on_job_done=lambda job: self.root.after(0, self.update_batch_job_done, job),
+                on_log=self.log
+            )
+            target = self.run_batch
+        
+        thread = threading.Thread(target=target, daemon=True)
         thread.start()
         
         self.update_timer()
+        self.sample_progress()
     
     def run_conversion(self):
-        """Ejecuta conversión con seguimiento de fragmentos (MEJORA 2)."""
+        """Ejecuta la conversión con el motor sin GUI (MEJORA 2 y 4)."""
         try:
-            # Sanitizar nombre
-            safe_name = re.sub(r'[^A-Za-z0-9._-]', '_', self.input_file.stem)
-            safe_name = safe_name.replace('%', '_')
-            base_name = safe_name
-            self._last_base_name = base_name
-            
-            output_pattern = str(self.output_dir / f"%03d_{base_name}.mp3")
-            
-            cmd = [
-                "ffmpeg",
-                "-hide_banner",
-                "-loglevel", "info",
-                "-i", str(self.input_file),
-                "-vn",
-                "-map", "0:a",
-                "-acodec", "libmp3lame",
-                "-q:a", "2",
-                "-threads", "0",
-                "-f", "segment",
-                "-segment_time", str(self.chunk_duration),
-                "-segment_format", "mp3",
-                "-reset_timestamps", "1",
-                "-progress", "pipe:1",
-                "-nostats",
-                "-y",
-                output_pattern
-            ]
-            
-            popen_kwargs = {
-                'stdout': subprocess.PIPE,
-                'stderr': subprocess.STDOUT,
-                'text': True,
-                'bufsize': 1
-            }
-            if self.os_name == "Windows":
-                popen_kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
-            
-            try:
-                self.ffmpeg_process = subprocess.Popen(cmd, **popen_kwargs)
-                process = self.ffmpeg_process
-            except Exception as e:
-                self.root.after(0, self.conversion_error, f"No se pudo iniciar ffmpeg: {e}")
-                return
-            
-            time_pattern = re.compile(r"out_time_ms=(\d+)")
-            
-            # --- MEJORA 2: Seguimiento de fragmentos ---
-            last_fragment = -1
-            total_fragments = math.ceil(self.total_duration / self.chunk_duration)
-            
-            while process.poll() is None and self.is_processing:
-                try:
-                    line = process.stdout.readline()
-                except Exception:
-                    line = ''
-                if not line:
-                    time.sleep(0.05)
-                    continue
-                
-                line = line.strip()
-                
-                time_match = time_pattern.search(line)
-                if time_match:
-                    try:
-                        out_time_ms = int(time_match.group(1))
-                        self.current_time = out_time_ms / 1_000_000.0
-                        
-                        if self.total_duration > 0:
-                            self.current_progress = min(1.0, self.current_time / self.total_duration)
-                            self.root.after(0, self.update_progress_ui, self.current_progress)
-                            
-                            # --- MEJORA 2: Detectar cambio de fragmento ---
-                            current_fragment = int(self.current_time // self.chunk_duration)
-                            if current_fragment != last_fragment:
-                                last_fragment = current_fragment
-                                self.root.after(
-                                    0,
-                                    self.update_file_progress,
-                                    min(current_fragment + 1, total_fragments),
-                                    total_fragments
-                                )
-                    except Exception:
-                        pass
-                
-                if "error" in line.lower():
-                    self.root.after(0, self.log, f"ERROR: {line}")
-            
-            # Si se detuvo manualmente, terminar proceso
-            if not self.is_processing and process.poll() is None:
-                try:
-                    process.terminate()
-                    try:
-                        process.wait(timeout=5)
-                    except subprocess.TimeoutExpired:
-                        process.kill()
-                except Exception:
-                    pass
-            
-            try:
-                return_code = process.wait(timeout=30)
-            except subprocess.TimeoutExpired:
-                try:
-                    process.terminate()
-                    process.wait(timeout=5)
-                except Exception:
-                    try:
-                        process.kill()
-                    except Exception:
-                        pass
-                self.root.after(0, self.conversion_error, "Timeout esperando finalización de FFmpeg")
-                return
-            
-            if return_code == 0:
-                elapsed = time.time() - self.start_time if self.start_time else 0.0
-                self.root.after(0, self.conversion_complete, f"Conversión completada en {elapsed:.1f}s")
-            else:
-                self.root.after(0, self.conversion_error, f"FFmpeg terminó con código {return_code}")
-        
+            result = self.engine.run()
+        except Exception as e:
+            result = {"ok": False, "message": str(e)}
+        
+        if result["ok"]:
+            self.root.after(0, self.conversion_complete, result["message"], result["files"])
+        else:
+            if result.get("files"):
+                self.log(f"📁 Se conservan {len(result['files'])} fragmentos completos")
+            self.root.after(0, self.conversion_error, result["message"])
+    
+    def run_batch(self):
+        """MEJORA 5: Ejecuta la cola por lotes en el hilo de trabajo."""
+        queue = self.batch_queue
+        try:
+            queue.plan()
+            self.total_duration = queue.total_duration
+            # MEJORA 11: el lote completo debe caber en cada destino
+            for check in queue.preflight():
+                message = estimacion_espacio.space_message(check)
+                if check["status"] == "insuficiente":
+                    self.root.after(0, self.conversion_error, message)
+                    return
+                self.log(("💾 " if check["status"] == "ok" else "⚠️ ") + message)
+            summary = queue.run()
         except Exception as e:
             self.root.after(0, self.conversion_error, str(e))
-        finally:
-            try:
-                self.ffmpeg_process = None
-            except Exception:
-                pass
+            return
+        
+        files = []
+        for job in queue.jobs:
+            if job["result"]:
+                files.extend(job["result"]["files"])
+        
+        message = (f"{summary['completed']}/{summary['jobs']} archivos en {summary['elapsed']:.1f}s "
+                   f"({summary['speed']:.1f}x tiempo real)")
+        if summary["ok"]:
+            self.root.after(0, self.conversion_complete, message, files)
+        else:
+            self.root.after(0, self.conversion_error, f"{summary['failed']} archivos fallaron. {message}")
+    
+    def sample_progress(self):
+        """MEJORA 9: Muestrea el canal de progreso a ritmo fijo.
+        
+        El coste en la interfaz no depende de cuántas líneas escriba FFmpeg:
+        solo se lee el último estado de los trabajos que cambiaron.
+        """
+        version, changed = self.progress_channel.changed_since(self._progress_version)
+        self._progress_version = version
+        
+        if changed and self.batch_queue:
+            self.current_progress = self.batch_queue.aggregate_progress()
+            self.current_time = self.current_progress * self.batch_queue.total_duration
+            self.update_progress_ui(self.current_progress)
+        elif changed and self.engine:
+            state = changed[-1]
+            if state.get("time") is not None:
+                self.current_time = state["time"]
+                self.current_progress = state.get("progress", 0.0)
+                self.update_progress_ui(self.current_progress)
+            
+            total = state.get("total_fragments") or 0
+            fragment = state.get("fragments_done" if self.engine.parallel else "fragment")
+            if fragment is not None and fragment != self._last_fragment:
+                self._last_fragment = fragment
+                if self.engine.parallel:
+                    self.update_parallel_progress(fragment, total)
+                else:
+                    self.update_file_progress(fragment, total)
+        
+        if self.is_processing:
+            self.root.after(self.PROGRESS_SAMPLE_MS, self.sample_progress)
     
     def update_progress_ui(self, progress):
         """Actualiza barra de progreso."""
         self.progress_bar['value'] = progress * 100
         self.percentage_label.config(text=f"{progress*100:.0f}%")
-        self.status_label.config(text=f"Procesando... {progress*100:.0f}%")
+        if not self.stop_requested:
+            self.status_label.config(text=f"Procesando... {progress*100:.0f}%")
     
     def update_file_progress(self, current, total):
         """MEJORA 2: Actualiza el progreso por archivo."""
         self.file_progress_label.config(text=f"Archivo: {current}/{total}")
         self.log(f"📦 Generando fragmento {current} de {total}")
     
+    def update_parallel_progress(self, completed, total):
+        """MEJORA 4: Actualiza el contador de fragmentos terminados en modo paralelo."""
+        self.file_progress_label.config(text=f"Archivo: {completed}/{total}")
+        if completed:
+            self.log(f"📦 Fragmento terminado ({completed} de {total})")
+    
+    def update_batch_job_done(self, job):
+        """MEJORA 5: Registra el fin de un trabajo del lote con su rendimiento."""
+        queue = self.batch_queue
+        done = sum(1 for j in queue.jobs if j["status"] in ("ok", "error", "cancelado"))
+        self.file_progress_label.config(text=f"Archivo: {done}/{len(queue.jobs)}")
+        if job["status"] == "ok":
+            self.log(f"✅ {job['input'].name}: {job['elapsed']:.1f}s ({job['speed']:.1f}x)")
+        elif job["status"] == "error":
+            self.log(f"❌ {job['input'].name}: {job['result']['message']}")
+    
     def update_timer(self):
         """Actualiza timer y estadísticas."""
         if not self.is_processing:
             return
         
-        elapsed = time.time() - self.start_time if self.start_time else 0.0
+        elapsed = self.active_elapsed()
         minutes = int(elapsed // 60)
         seconds = int(elapsed % 60)
         self.time_label.config(text=f"Tiempo: {minutes:02d}:{seconds:02d}")
@@ -640,46 +917,91 @@ Bitrate detectado: {info['bitrate'] // 1000 if info['bitrate'] else 'Desconocido
         if self.is_processing:
             self.root.after(1000, self.update_timer)
     
+    def active_elapsed(self):
+        """MEJORA 16: Segundos de conversión sin contar las pausas."""
+        if not self.start_time:
+            return 0.0
+        paused = self.paused_seconds
+        if self.pause_started is not None:
+            paused += time.time() - self.pause_started
+        return time.time() - self.start_time - paused
+    
     def stop_conversion(self):
-        """Solicita detención y termina ffmpeg."""
-        self.is_processing = False
-        self.stop_button.configure(state='disabled')
-        self.status_label.config(text="⏸️ Deteniendo...")
-        self.log("Solicitud de detención enviada...")
-        
-        if hasattr(self, "ffmpeg_process") and self.ffmpeg_process:
-            try:
-                self.ffmpeg_process.terminate()
-                try:
-                    self.ffmpeg_process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    self.ffmpeg_process.kill()
-            except Exception as e:
-                self.log(f"Error terminando proceso: {e}")
+        """MEJORA 16: Solicita detención sin esperar a FFmpeg en el hilo de la interfaz.
+        
+        El primer clic deja terminar el fragmento en curso; el segundo detiene ya.
+        """
+        graceful = not self.stop_requested
+        self.stop_requested = True
+        self.pause_button.configure(state='disabled')
+        if graceful:
+            self.stop_button.configure(text="⏹️ DETENER YA")
+            self.status_label.config(text="⏸️ Terminando el fragmento en curso...")
+            self.log("Solicitud de detención enviada (se termina el fragmento en curso)...")
+        else:
+            self.is_processing = False
+            self.stop_button.configure(state='disabled')
+            self.status_label.config(text="⏸️ Deteniendo...")
+            self.log("Detención inmediata solicitada...")
+        self.resume_clock()
+        
+        engine, batch_queue = self.engine, self.batch_queue
+        
+        def request_stop():
+            if engine:
+                engine.stop(graceful=graceful)
+            if batch_queue:
+                batch_queue.stop(graceful=graceful)
+        
+        threading.Thread(target=request_stop, daemon=True).start()
+    
+    def toggle_pause(self):
+        """MEJORA 16: Suspende o reanuda los procesos FFmpeg sin perder el avance."""
+        target = self.batch_queue or self.engine
+        if target is None:
+            return
+        self.is_paused = not self.is_paused
+        if self.is_paused:
+            self.pause_started = time.time()
+            self.pause_button.configure(text="▶️ REANUDAR")
+            self.status_label.config(text="⏸️ En pausa")
+            action = target.pause
+        else:
+            self.resume_clock()
+            self.pause_button.configure(text="⏯️ PAUSAR")
+            self.status_label.config(text=f"Procesando... {self.current_progress*100:.0f}%")
+            action = target.unpause
+        threading.Thread(target=action, daemon=True).start()
+    
+    def resume_clock(self):
+        """Suma la pausa en curso (si la hay) al tiempo en pausa."""
+        if self.pause_started is not None:
+            self.paused_seconds += time.time() - self.pause_started
+            self.pause_started = None
+        self.is_paused = False
     
-    def conversion_complete(self, message):
+    def conversion_complete(self, message, files=None):
         """Procesa finalización exitosa."""
         self.is_processing = False
         self.progress_bar['value'] = 100
         self.percentage_label.config(text="100%")
         self.status_label.config(text="✅ Conversión completada", foreground="green")
         
-        elapsed = time.time() - self.start_time if self.start_time else 0.0
+        elapsed = self.active_elapsed()
         minutes = int(elapsed // 60)
         seconds = int(elapsed % 60)
         self.time_label.config(text=f"Tiempo total: {minutes:02d}:{seconds:02d}")
         
         self.convert_button.configure(state='normal')
-        self.stop_button.configure(state='disabled')
+        self.stop_button.configure(state='disabled', text="⏸️ DETENER")
+        self.pause_button.configure(state='disabled', text="⏯️ PAUSAR")
         self.open_button.configure(state='normal')
         
         self.log("=" * 70)
         self.log(f"✅ COMPLETADO: {message}")
         
         try:
-            base = getattr(self, '_last_base_name', self.input_file.stem)
-            mp3_files = list(self.output_dir.glob(f"*_{base}.mp3"))
-            mp3_files.sort()
+            mp3_files = files if files is not None else self.engine.output_files()
             self.log(f"📦 Archivos creados: {len(mp3_files)}")
             for i, f in enumerate(mp3_files[:5], 1):
                 size_mb = f.stat().st_size / (1024 * 1024)
@@ -697,7 +1019,8 @@ Bitrate detectado: {info['bitrate'] // 1000 if info['bitrate'] else 'Desconocido
         self.is_processing = False
         self.status_label.config(text="❌ Error", foreground="red")
         self.convert_button.configure(state='normal')
-        self.stop_button.configure(state='disabled')
+        self.stop_button.configure(state='disabled', text="⏸️ DETENER")
+        self.pause_button.configure(state='disabled', text="⏯️ PAUSAR")
         self.log(f"❌ ERROR: {error_msg}")
         try:
             messagebox.showerror("Error", f"Fallo en conversión:\n{error_msg}")
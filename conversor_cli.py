@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conversor M4A a MP3 con división automática - LÍNEA DE COMANDOS
+- No importa tkinter: apto para servidores sin entorno gráfico y cron
+- Progreso legible por máquinas: una línea JSON por evento en stdout
+- Acepta varios archivos o carpetas y los convierte en paralelo (--jobs)
+- Varias salidas con una sola decodificación (--format mp3:q=2 --format opus:b=48k)
+- Cortes en silencios cercanos a cada corte nominal (--silence, requiere NumPy)
+- El progreso se muestrea a intervalo fijo (--progress-interval), no por línea de FFmpeg
+- Modo servicio: vigila carpetas y convierte lo que va llegando (--watch)
+- Comprueba antes de empezar que la salida estimada cabe en el disco (--ignore-space)
+- Perfiles de codificación (--profile speech) o elección automática (--profile auto)
+- División por tamaño máximo de fragmento en una sola pasada (--max-size 25M)
+- Guarda el MP3 intermedio de cada entrada: cambiar -m después solo copia tramas
+- Audiolibros: un fragmento por capítulo o capítulos agrupados (--chapters [group])
+- La misma grabación con otro nombre no se recodifica: caché por contenido (--conversion-budget)
+- Señales (POSIX): SIGUSR1 pausa, SIGUSR2 reanuda y SIGTERM detiene al cerrar
+  el fragmento en curso (un segundo SIGTERM detiene en el acto)
+
+Uso:
+    python conversor_cli.py entrada.m4a [más archivos o carpetas...] -o salida -m 10 -q 2 -j 4
+    python conversor_cli.py charla.m4a -p auto --target-bitrate 64k
+    python conversor_cli.py --watch carpeta_entrada [más carpetas...] -o salida -j 2
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+import analisis_silencios
+import cache_conversion
+import cache_intermedia
+import division_tamano
+import estimacion_espacio
+import perfiles_codificacion
+from canal_progreso import ProgressChannel
+from cola_conversion import BatchQueue
+from motor_conversion import check_dependencies, parse_output_spec
+import vigilancia_carpetas
+
+
+def emit(event, **data):
+    """Escribe un evento JSON en stdout (una línea por evento)."""
+    data["event"] = event
+    data["ts"] = round(time.time(), 3)
+    sys.stdout.write(json.dumps(data, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convierte audio a MP3 dividido en fragmentos (sin GUI)."
+    )
+    parser.add_argument("inputs", nargs="+", type=Path,
+                        help="Archivos de audio o carpetas de entrada")
+    parser.add_argument("-o", "--output-dir", type=Path, default=None,
+                        help="Carpeta de salida (por defecto, la del archivo de entrada)")
+    parser.add_argument("-m", "--minutes", type=float, default=10,
+                        help="Minutos por fragmento (por defecto: 10)")
+    parser.add_argument("--max-size", default=None,
+                        help="Dividir por tamaño: cada fragmento MP3 termina antes de pasar "
+                             "de este tamaño, p. ej. 25M (sustituye a -m al cortar)")
+    parser.add_argument("-q", "--quality", type=int, default=2, choices=range(10),
+                        metavar="0-9", help="Calidad VBR de LAME, -q:a (por defecto: 2)")
+    parser.add_argument("-p", "--profile", default=None,
+                        choices=list(perfiles_codificacion.PROFILES) + [perfiles_codificacion.AUTO],
+                        help="Perfil de codificación MP3 (sustituye a -q); 'auto' prueba una "
+                             "muestra de cada entrada y elige el más rápido que cumple el objetivo")
+    parser.add_argument("--target-bitrate", default=None,
+                        help="Objetivo del perfil automático, p. ej. 96k "
+                             f"(por defecto: {perfiles_codificacion.DEFAULT_TARGET_KBPS}k)")
+    parser.add_argument("--target-size", default=None,
+                        help="Objetivo del perfil automático como tamaño total por archivo, "
+                             "p. ej. 300M")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Codificar cada fragmento con su propio FFmpeg en paralelo")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Máximo de procesos FFmpeg por archivo en modo paralelo "
+                             "(por defecto: núcleos repartidos entre los --jobs)")
+    parser.add_argument("--reencode", action="store_true",
+                        help="Recodificar aunque la entrada ya sea MP3 (por defecto se copia)")
+    parser.add_argument("-F", "--format", dest="formats", action="append", default=None,
+                        metavar="FORMATO[:q=N|:b=BITRATE|:p=PERFIL][:dir=CARPETA]",
+                        help="Salida adicional (mp3, opus, aac); repetible. Con varias, "
+                             "cada una va a su subcarpeta")
+    parser.add_argument("--chapters", nargs="?", const="each", default=None, choices=["each", "group"],
+                        help="Cortar en los capítulos de la entrada: 'each' uno por capítulo "
+                             "(por defecto), 'group' agrupa capítulos hasta -m minutos")
+    parser.add_argument("--silence", action="store_true",
+                        help="Ajustar cada corte al silencio más cercano (requiere NumPy)")
+    parser.add_argument("--silence-db", type=float, default=analisis_silencios.DEFAULT_THRESHOLD_DB,
+                        help="Umbral de silencio en dBFS (por defecto: %(default)s)")
+    parser.add_argument("--silence-min", type=float, default=analisis_silencios.DEFAULT_MIN_SILENCE,
+                        help="Duración mínima de silencio en segundos (por defecto: %(default)s)")
+    parser.add_argument("--silence-window", type=float,
+                        default=analisis_silencios.DEFAULT_SEARCH_WINDOW,
+                        help="Margen de búsqueda alrededor de cada corte en segundos "
+                             "(por defecto: %(default)s)")
+    parser.add_argument("--no-resume", dest="resume", action="store_false",
+                        help="Ignorar fragmentos ya terminados y volver a convertir todo")
+    parser.add_argument("--no-report", dest="report", action="store_false",
+                        help="No escribir el informe JSON de tiempos junto a los fragmentos")
+    parser.add_argument("--no-intermediate-cache", dest="intermediate_cache", action="store_false",
+                        help="No guardar ni reutilizar el MP3 intermedio completo de cada entrada")
+    parser.add_argument("--intermediate-budget", default=None,
+                        help="Tamaño máximo de la caché de MP3 intermedios, p. ej. 5G "
+                             "(por defecto: "
+                             f"{cache_intermedia.DEFAULT_BUDGET_BYTES // 1000 ** 3}G)")
+    parser.add_argument("--no-conversion-cache", dest="conversion_cache", action="store_false",
+                        help="No reutilizar conversiones de entradas con el mismo contenido")
+    parser.add_argument("--conversion-budget", default=None,
+                        help="Tamaño máximo de la caché de conversiones, p. ej. 20G "
+                             "(por defecto: "
+                             f"{cache_conversion.DEFAULT_BUDGET_BYTES // 1000 ** 3}G)")
+    parser.add_argument("--ignore-space", action="store_true",
+                        help="Convertir aunque la salida estimada no quepa en el disco")
+    parser.add_argument("--progress-interval", type=float, default=0.5,
+                        help="Segundos entre eventos de progreso (por defecto: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Archivos convertidos a la vez (por defecto: núcleos)")
+    watch = parser.add_argument_group("modo servicio (--watch)")
+    watch.add_argument("--watch", action="store_true",
+                       help="Vigilar las carpetas de entrada y convertir los archivos nuevos")
+    watch.add_argument("--recursive", action="store_true",
+                       help="Vigilar también las subcarpetas")
+    watch.add_argument("--stable-seconds", type=float,
+                       default=vigilancia_carpetas.DEFAULT_STABLE_SECONDS,
+                       help="Segundos sin cambios de tamaño para dar un archivo por completo "
+                            "(por defecto: %(default)s)")
+    watch.add_argument("--poll-interval", type=float,
+                       default=vigilancia_carpetas.DEFAULT_POLL_INTERVAL,
+                       help="Segundos entre revisiones de las carpetas (por defecto: %(default)s)")
+    watch.add_argument("--retry-seconds", type=float,
+                       default=vigilancia_carpetas.DEFAULT_RETRY_SECONDS,
+                       help="Espera antes de reintentar un archivo que falló "
+                            "(por defecto: %(default)s)")
+    watch.add_argument("--max-backlog", type=int, default=vigilancia_carpetas.DEFAULT_MAX_BACKLOG,
+                       help="Trabajos encolados o en curso como máximo (por defecto: %(default)s)")
+    watch.add_argument("--ledger", type=Path, default=None,
+                       help="Archivo JSON con el registro de procesados "
+                            "(por defecto: en la carpeta de caché)")
+    args = parser.parse_args(argv)
+
+    if args.silence and not analisis_silencios.numpy_available():
+        parser.error("--silence requiere NumPy (pip install numpy)")
+    if args.watch:
+        if not args.output_dir:
+            parser.error("--watch requiere una carpeta de salida (-o)")
+        missing = [str(path) for path in args.inputs if not path.is_dir()]
+        if missing:
+            parser.error(f"--watch necesita carpetas: {', '.join(missing)}")
+        if any(path.resolve() == args.output_dir.resolve() for path in args.inputs):
+            parser.error("--watch: la carpeta de salida no puede ser una carpeta vigilada")
+
+    args.target_size_bytes = None
+    if args.target_size is not None:
+        args.target_size_bytes = estimacion_espacio.parse_size(args.target_size)
+        if args.target_size_bytes is None or args.target_size_bytes <= 0:
+            parser.error(f"Tamaño no válido: {args.target_size}")
+    if args.target_bitrate is not None:
+        bitrate = estimacion_espacio.parse_bitrate(args.target_bitrate)
+        if bitrate is None or bitrate <= 0:
+            parser.error(f"Bitrate no válido: {args.target_bitrate}")
+    if args.intermediate_budget is not None:
+        budget = estimacion_espacio.parse_size(args.intermediate_budget)
+        if budget is None or budget <= 0:
+            parser.error(f"Tamaño no válido: {args.intermediate_budget}")
+        cache_intermedia.intermediate_cache().budget_bytes = budget
+    if args.conversion_budget is not None:
+        budget = estimacion_espacio.parse_size(args.conversion_budget)
+        if budget is None or budget <= 0:
+            parser.error(f"Tamaño no válido: {args.conversion_budget}")
+        cache_conversion.conversion_cache().budget_bytes = budget
+
+    args.max_fragment_bytes = None
+    if args.max_size is not None:
+        args.max_fragment_bytes = estimacion_espacio.parse_size(args.max_size)
+        if not args.max_fragment_bytes:
+            parser.error(f"Tamaño no válido: {args.max_size}")
+        if args.max_fragment_bytes < division_tamano.MIN_FRAGMENT_BYTES:
+            parser.error(f"--max-size debe ser de al menos "
+                         f"{division_tamano.MIN_FRAGMENT_BYTES // 1024} KB")
+    if args.profile and args.formats:
+        parser.error("--profile se aplica a la salida por defecto; con -F usa mp3:p=PERFIL")
+
+    args.outputs = None
+    if args.formats:
+        try:
+            args.outputs = [parse_output_spec(spec) for spec in args.formats]
+        except (ValueError, KeyError) as e:
+            parser.error(str(e))
+        if len(args.outputs) == 1 and ":dir=" not in args.formats[0]:
+            args.outputs[0]["subdir"] = ""
+    return args
+
+
+def _job_event(job):
+    return {"file": str(job["input"]), "duration": round(job["duration"], 2)}
+
+
+def main(argv=None):
+    """Función principal."""
+    args = parse_args(argv)
+
+    if not check_dependencies(log=lambda message: emit("log", message=message)):
+        emit("error", message="FFmpeg o FFprobe no están instalados o no se encuentran en el PATH.")
+        return 2
+
+    if args.watch:
+        return watch(args)
+
+    for path in args.inputs:
+        if not path.exists():
+            emit("error", file=str(path), message="El archivo no existe")
+
+    channel = ProgressChannel()
+    queue = BatchQueue(
+        args.inputs,
+        output_dir=args.output_dir,
+        max_jobs=args.jobs,
+        engine_options=_engine_options(args),
+        progress_channel=channel,
+        on_job_start=lambda job: emit("start", output_dir=str(job["output_dir"]), **_job_event(job)),
+        on_job_done=_emit_job_done,
+        on_log=lambda message: emit("log", message=message)
+    )
+    if not queue.jobs:
+        emit("error", message="No se encontraron archivos de audio")
+        return 1
+
+    queue.plan()
+    emit("queue", jobs=[_job_event(job) for job in queue.jobs])
+
+    # Antes de gastar CPU: ¿cabe la salida estimada en cada destino?
+    for check in queue.preflight():
+        emit("space", **check)
+        if check["status"] == "insuficiente" and not args.ignore_space:
+            emit("error", message=estimacion_espacio.space_message(check))
+            return 3
+
+    stop_sampling = threading.Event()
+    sampler = threading.Thread(
+        target=_sample_progress,
+        args=(channel, queue, args.progress_interval, stop_sampling),
+        daemon=True
+    )
+    sampler.start()
+    _handle_signals(queue, queue.stop)
+    try:
+        summary = queue.run()
+    except KeyboardInterrupt:
+        queue.stop()
+        raise
+    finally:
+        stop_sampling.set()
+        sampler.join()
+
+    emit("batch_done", **{key: round(value, 2) if isinstance(value, float) else value
+                          for key, value in summary.items()})
+    missing = any(not path.exists() for path in args.inputs)
+    return 0 if summary["ok"] and not missing else 1
+
+
+def watch(args):
+    """Modo servicio: convierte los archivos que aparecen hasta Ctrl+C."""
+    channel = ProgressChannel()
+    watcher = vigilancia_carpetas.FolderWatcher(
+        args.inputs,
+        args.output_dir,
+        max_jobs=args.jobs,
+        max_backlog=args.max_backlog,
+        stable_seconds=args.stable_seconds,
+        poll_interval=args.poll_interval,
+        retry_seconds=args.retry_seconds,
+        recursive=args.recursive,
+        ledger=vigilancia_carpetas.ProcessedLedger(args.ledger),
+        engine_options=_engine_options(args),
+        progress_channel=channel,
+        on_job_start=lambda job: emit("start", output_dir=str(job["output_dir"]), **_job_event(job)),
+        on_job_done=lambda job: _emit_watch_done(watcher, job),
+        on_log=lambda message: emit("log", message=message)
+    )
+
+    stop_sampling = threading.Event()
+    sampler = threading.Thread(
+        target=_sample_progress,
+        args=(channel, watcher.queue, args.progress_interval, stop_sampling),
+        daemon=True
+    )
+    sampler.start()
+    _handle_signals(watcher.queue, watcher.stop)
+    try:
+        summary = watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+        summary = dict(watcher.stats)
+    finally:
+        stop_sampling.set()
+        sampler.join()
+
+    emit("watch_done", **{key: round(value, 2) if isinstance(value, float) else value
+                          for key, value in summary.items()})
+    return 0
+
+
+def _handle_signals(queue, stop):
+    """Pausa, reanudación y parada limpia por señales (solo POSIX).
+
+    Ctrl+C llega también a los FFmpeg del terminal, así que la parada
+    limpia se pide con SIGTERM (``kill PID``) y no con SIGINT.
+    """
+    if os.name != "posix":
+        return
+    stopping = []
+
+    def on_term(signum, frame):
+        graceful = not stopping
+        stopping.append(signum)
+        emit("log", message="Deteniendo al cerrar el fragmento en curso" if graceful
+             else "Deteniendo en el acto")
+        stop(graceful=graceful)
+
+    def on_pause(signum, frame):
+        emit("log", message="Pausa")
+        queue.pause()
+
+    def on_resume(signum, frame):
+        emit("log", message="Reanudación")
+        queue.unpause()
+
+    signal.signal(signal.SIGTERM, on_term)
+    signal.signal(signal.SIGUSR1, on_pause)
+    signal.signal(signal.SIGUSR2, on_resume)
+
+
+def _emit_watch_done(watcher, job):
+    _emit_job_done(job)
+    stats = dict(watcher.stats, audio_seconds=round(watcher.stats["audio_seconds"], 2))
+    emit("backlog", pending=watcher.backlog, **stats)
+
+
+def _engine_options(args):
+    return {
+        "chunk_duration": args.minutes * 60,
+        "quality": args.quality,
+        "profile": args.profile,
+        "target_bitrate": args.target_bitrate,
+        "target_size": args.target_size_bytes,
+        "max_fragment_bytes": args.max_fragment_bytes,
+        "intermediate_cache": args.intermediate_cache,
+        "conversion_cache": args.conversion_cache,
+        "parallel": args.parallel,
+        "max_workers": args.workers,
+        "outputs": args.outputs,
+        "stream_copy": not args.reencode,
+        "silence_split": args.silence,
+        "chapter_split": args.chapters,
+        "resume": args.resume,
+        "report": args.report,
+        "space_check": not args.ignore_space,
+        "silence_options": {
+            "threshold_db": args.silence_db,
+            "min_silence": args.silence_min,
+            "search_window": args.silence_window
+        }
+    }
+
+
+def _sample_progress(channel, queue, interval, stop_event):
+    """Emite el último estado de los trabajos que cambiaron, a intervalo fijo."""
+    version = 0
+    while not stop_event.wait(interval):
+        version = _emit_progress(channel, queue, version)
+    _emit_progress(channel, queue, version)
+
+
+def _emit_progress(channel, queue, version):
+    version, changed = channel.changed_since(version)
+    for state in changed:
+        if state.get("time") is None:
+            continue
+        emit("progress",
+             file=state["job"],
+             progress=round(state.get("progress", 0.0), 4),
+             time=round(state["time"], 2),
+             speed=state.get("speed"),
+             size=state.get("size"),
+             fragment=state.get("fragment", state.get("fragments_done")),
+             total_fragments=state.get("total_fragments"),
+             total_progress=round(queue.aggregate_progress(), 4))
+    return version
+
+
+def _emit_job_done(job):
+    result = job["result"] or {}
+    if job["status"] == "ok":
+        emit("done", message=result["message"], elapsed=round(job["elapsed"], 2),
+             speed=round(job["speed"], 2), files=[str(f) for f in result["files"]],
+             **_job_event(job))
+    else:
+        emit("error", message=result.get("message", "Cancelado"),
+             cancelled=job["status"] == "cancelado",
+             files=[str(f) for f in result.get("files") or []], **_job_event(job))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
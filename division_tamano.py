@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+División de MP3 por tamaño máximo de fragmento, en una sola pasada
+- FFmpeg codifica una vez y escribe el MP3 por stdout (sin Xing ni ID3)
+- Aquí se recorre trama a trama y se empieza un archivo nuevo justo antes
+  de la trama que haría pasar el fragmento del tamaño máximo
+- Cada fragmento lleva su propia cabecera Xing (número de tramas y bytes)
+  para que los reproductores calculen bien la duración de un VBR
+- Los fragmentos se escriben como ``.part`` y se renombran al cerrarse
+"""
+
+import os
+import struct
+from pathlib import Path
+
+
+# Bitrates (kbps) de Layer III por índice: MPEG-1 y MPEG-2/2.5
+BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Frecuencias por bits de versión: 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+# Índice de bitrate de la trama Xing: lo bastante grande para la etiqueta
+XING_BITRATE_INDEX = {1: 9, 2: 8}
+
+MIN_FRAGMENT_BYTES = 64 * 1024
+
+
+def parse_frame_header(data, pos=0):
+    """Longitud, muestras y frecuencia de la trama MP3 en ``pos``, o None.
+
+    Solo se aceptan tramas de Layer III con campos válidos.
+    """
+    if len(data) < pos + 4:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 3
+    layer = (b1 >> 1) & 3
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    return {
+        "length": (144 if mpeg1 else 72) * bitrate // sample_rate + padding,
+        "samples": 1152 if mpeg1 else 576,
+        "sample_rate": sample_rate,
+        "mpeg1": mpeg1,
+        "mono": (b3 >> 6) == 3
+    }
+
+
+def xing_frame(header, frames=0, size=0):
+    """Trama vacía con la etiqueta Xing, del mismo tipo que ``header``.
+
+    ``header`` son los 4 bytes de la primera trama de audio del fragmento.
+    """
+    info = parse_frame_header(header)
+    mpeg1 = info["mpeg1"]
+    b2 = (XING_BITRATE_INDEX[1 if mpeg1 else 2] << 4) | (header[2] & 0x0C) | (header[2] & 0x01)
+    frame_header = bytes((header[0], header[1], b2, header[3]))
+    length = parse_frame_header(frame_header)["length"]
+    # La etiqueta va tras la información lateral, cuyo tamaño depende de versión y canales
+    side_info = (17 if info["mono"] else 32) if mpeg1 else (9 if info["mono"] else 17)
+    tag = b"Xing" + struct.pack(">III", 0x3, frames, size)
+    frame = bytearray(length)
+    frame[:4] = frame_header
+    frame[4 + side_info:4 + side_info + len(tag)] = tag
+    return bytes(frame)
+
+
+class MP3SizeSplitter:
+    """Reparte un flujo MP3 en archivos de como mucho ``max_bytes``.
+
+    ``path_for(indice)`` da la ruta final de cada fragmento y
+    ``on_fragment(indice, ruta, bytes, segundos)`` se llama al cerrarlo.
+    """
+
+    def __init__(self, path_for, max_bytes, on_fragment=None):
+        if max_bytes < MIN_FRAGMENT_BYTES:
+            raise ValueError(f"El tamaño máximo de fragmento debe ser de al menos "
+                             f"{MIN_FRAGMENT_BYTES // 1024} KB")
+        self.path_for = path_for
+        self.max_bytes = max_bytes
+        self.on_fragment = on_fragment
+        self.index = -1
+        self.files = []
+        self.skipped_bytes = 0
+        self._buffer = bytearray()
+        self._file = None
+        self._path = None
+        self._header = None
+        self._frames = 0
+        self._size = 0
+        self._seconds = 0.0
+
+    def feed(self, data):
+        """Añade bytes del flujo; escribe todas las tramas completas."""
+        buffer = self._buffer
+        buffer += data
+        pos = 0
+        while len(buffer) - pos >= 4:
+            frame = parse_frame_header(buffer, pos)
+            if frame is None:
+                # Resincronizar con la siguiente marca 0xFF
+                next_sync = buffer.find(b"\xff", pos + 1)
+                next_sync = len(buffer) if next_sync < 0 else next_sync
+                self.skipped_bytes += next_sync - pos
+                pos = next_sync
+                continue
+            if len(buffer) - pos < frame["length"]:
+                break
+            self._write_frame(buffer[pos:pos + frame["length"]], frame)
+            pos += frame["length"]
+        del buffer[:pos]
+
+    def _write_frame(self, data, frame):
+        if self._file is not None and self._size + len(data) > self.max_bytes:
+            self._close_fragment()
+        if self._file is None:
+            self._open_fragment(bytes(data[:4]))
+        self._file.write(data)
+        self._frames += 1
+        self._size += len(data)
+        self._seconds += frame["samples"] / frame["sample_rate"]
+
+    def _open_fragment(self, header):
+        self.index += 1
+        self._path = Path(self.path_for(self.index))
+        self._file = open(self._path.with_name(self._path.name + ".part"), "wb")
+        self._header = header
+        placeholder = xing_frame(header)
+        self._file.write(placeholder)
+        self._frames = 0
+        self._size = len(placeholder)
+        self._seconds = 0.0
+
+    def _close_fragment(self):
+        # Cabecera Xing definitiva, con el recuento real de tramas y bytes
+        self._file.seek(0)
+        self._file.write(xing_frame(self._header, self._frames, self._size))
+        self._file.close()
+        self._file = None
+        os.replace(self._path.with_name(self._path.name + ".part"), self._path)
+        self.files.append(self._path)
+        if self.on_fragment is not None:
+            self.on_fragment(self.index, self._path, self._size, self._seconds)
+
+    def finish(self):
+        """Cierra el último fragmento; devuelve las rutas escritas."""
+        if self._file is not None:
+            self._close_fragment()
+        self.skipped_bytes += len(self._buffer)
+        self._buffer.clear()
+        return self.files
+
+    def abort(self):
+        """Descarta el fragmento a medio escribir (cancelación o error)."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self._path.with_name(self._path.name + ".part"))
+            except OSError:
+                pass
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estimación previa del tamaño de salida y del espacio libre
+- Modelo de bitrate medio de LAME por calidad VBR (-q:a 0-9)
+- Bitrate explícito, códecs por defecto de FFmpeg y copia sin recodificar
+- Tamaño total y por fragmento a partir de la duración de ffprobe
+- Comprobación del espacio libre del sistema de archivos de destino
+  antes de gastar CPU (un disco lleno deja fragmentos truncados)
+"""
+
+import math
+import os
+import shutil
+from pathlib import Path
+
+
+# Bitrate medio (kbps) de LAME en VBR para estéreo a 44,1/48 kHz, según la
+# tabla de calidades de LAME (-V0 ... -V9), calibrado con música variada
+LAME_VBR_KBPS = {0: 245, 1: 225, 2: 190, 3: 175, 4: 165, 5: 130, 6: 115, 7: 100, 8: 85, 9: 65}
+
+# Bitrate por defecto de los codificadores de FFmpeg sin -b:a (kbps, estéreo)
+DEFAULT_KBPS = {"opus": 96, "aac": 128}
+
+MONO_FACTOR = 0.6             # El VBR de LAME en mono gasta ~60 % del estéreo
+CONTAINER_OVERHEAD = 0.01     # Cabeceras de trama / índices del contenedor
+FRAGMENT_OVERHEAD = 4096      # Bytes fijos por archivo (Xing/LAME, ID3, moov)
+SAFETY_MARGIN = 0.10          # Margen sobre la estimación antes de avisar
+RESERVE_BYTES = 64 * 1024 * 1024  # Espacio que se deja siempre libre
+
+
+def parse_bitrate(value):
+    """Convierte "48k", "1.5M" o 192000 en bits por segundo (None si no se entiende)."""
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    factor = 1
+    if text.endswith("k"):
+        factor, text = 1000, text[:-1]
+    elif text.endswith("m"):
+        factor, text = 1_000_000, text[:-1]
+    try:
+        return float(text) * factor
+    except ValueError:
+        return None
+
+
+def parse_size(value):
+    """Convierte "25M", "1.5G", "700MiB" o 1000000 en bytes (None si no se entiende).
+
+    K/M/G son potencias de 1000 (como los límites de subida habituales);
+    KiB/MiB/GiB, de 1024.
+    """
+    if value is None:
+        return None
+    text = str(value).strip().upper()
+    factor = 1
+    for suffix, power in (("K", 1), ("M", 2), ("G", 3)):
+        if text.endswith(suffix + "IB"):
+            factor, text = 1024 ** power, text[:-3]
+            break
+        if text.endswith(suffix + "B") or text.endswith(suffix):
+            factor, text = 1000 ** power, text.rstrip("B")[:-1]
+            break
+    else:
+        text = text.rstrip("B")
+    try:
+        return int(float(text) * factor)
+    except ValueError:
+        return None
+
+
+def output_bitrate(output, info, stream_copy=True):
+    """Bitrate medio estimado (bits/s) de una salida para la entrada ``info``."""
+    info = info or {}
+    input_bitrate = info.get("bitrate") or 0
+    copy = output.get("copy") or output["format"] == "m4a"
+    resample = output.get("channels") or output.get("sample_rate")
+    if output["format"] == "mp3" and stream_copy and info.get("codec") == "mp3" and not resample:
+        copy = True
+    if copy and input_bitrate:
+        return float(input_bitrate)
+
+    explicit = parse_bitrate(output.get("bitrate"))
+    if explicit:
+        return explicit
+
+    mono = info.get("channels") == 1 or output.get("channels") == 1
+    if output["format"] == "mp3":
+        quality = output.get("quality")
+        kbps = LAME_VBR_KBPS.get(2 if quality is None else int(quality), LAME_VBR_KBPS[2])
+    else:
+        kbps = DEFAULT_KBPS.get(output["format"], 128)
+    return kbps * 1000 * (MONO_FACTOR if mono else 1.0)
+
+
+def nominal_ranges(duration, chunk_duration):
+    """(inicio, fin) de cada fragmento con cortes cada ``chunk_duration``."""
+    if duration <= 0 or chunk_duration <= 0:
+        return []
+    count = math.ceil(duration / chunk_duration)
+    return [(index * chunk_duration, min(duration, (index + 1) * chunk_duration))
+            for index in range(count)]
+
+
+def estimate_output(info, outputs, ranges, stream_copy=True):
+    """Tamaño estimado en bytes: ``{"total", "fragments", "bitrates"}``.
+
+    ``fragments`` tiene un tamaño por fragmento (todas las salidas juntas);
+    ``bitrates`` el bitrate supuesto de cada salida, en bits/s.
+    """
+    bitrates = [output_bitrate(output, info, stream_copy) for output in outputs]
+    fragments = []
+    for start, end in ranges:
+        seconds = max(0.0, end - start)
+        size = sum(bitrate / 8 * seconds * (1 + CONTAINER_OVERHEAD) + FRAGMENT_OVERHEAD
+                   for bitrate in bitrates)
+        fragments.append(int(size))
+    return {"total": sum(fragments), "fragments": fragments, "bitrates": bitrates}
+
+
+def _existing_parent(path):
+    """La propia ruta o el primer ancestro que exista (la salida puede no existir aún)."""
+    path = Path(path).resolve()
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return path
+
+
+def filesystem_id(path):
+    """Identificador del sistema de archivos que contiene ``path``."""
+    try:
+        return os.stat(_existing_parent(path)).st_dev
+    except OSError:
+        return str(path)
+
+
+def check_space(path, estimate):
+    """Compara la estimación con el espacio libre del destino.
+
+    ``status``: ``ok``, ``justo`` (cabe, pero sin el margen de seguridad),
+    ``insuficiente`` o ``desconocido`` (no se pudo consultar el disco).
+    """
+    required = int(estimate * (1 + SAFETY_MARGIN)) + RESERVE_BYTES
+    try:
+        free = shutil.disk_usage(_existing_parent(path)).free
+    except OSError:
+        free = None
+
+    if free is None:
+        status = "desconocido"
+    elif free < estimate:
+        status = "insuficiente"
+    elif free < required:
+        status = "justo"
+    else:
+        status = "ok"
+    return {"path": str(path), "estimate": estimate, "required": required,
+            "free": free, "status": status}
+
+
+def format_bytes(size):
+    """Tamaño legible: 512 KB, 38.4 MB, 1.25 GB."""
+    if size is None:
+        return "?"
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.2f} GB"
+    if size >= 1024 ** 2:
+        return f"{size / 1024 ** 2:.1f} MB"
+    return f"{size / 1024:.0f} KB"
+
+
+def space_message(check):
+    """Frase para el log o un diálogo a partir de ``check_space``."""
+    estimate = format_bytes(check["estimate"])
+    free = format_bytes(check["free"])
+    if check["status"] == "insuficiente":
+        return f"Espacio insuficiente en {check['path']}: se necesitan ~{estimate} y hay {free} libres"
+    if check["status"] == "justo":
+        return f"Espacio justo en {check['path']}: ~{estimate} estimados y {free} libres"
+    if check["status"] == "desconocido":
+        return f"No se pudo consultar el espacio libre de {check['path']} (~{estimate} estimados)"
+    return f"Salida estimada ~{estimate}; {free} libres en {check['path']}"
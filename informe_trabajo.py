@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Informe JSON por trabajo con tiempos por fase
+- Fases: dependencias, sondeo, elección de perfil, análisis de silencios,
+  arranque de FFmpeg, primer progreso, codificación, finalización,
+  MP3 intermedio y escaneo de salidas
+- Tiempo de codificación de cada fragmento
+- Muestras de velocidad y bitrate informadas por FFmpeg (número acotado)
+- Se escribe junto a los fragmentos para comparar trabajos en producción
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+
+# Nombres legibles de las fases, en el orden en que ocurren
+PHASES = {
+    "dependencias": "dependencias",
+    "sondeo": "sondeo",
+    "seleccion_perfil": "perfil",
+    "analisis_silencios": "silencios",
+    "cache_conversion": "caché",
+    "arranque_ffmpeg": "arranque",
+    "primer_progreso": "primer progreso",
+    "codificacion": "codificación",
+    "finalizacion": "finalización",
+    "intermedio": "intermedio",
+    "escaneo_salidas": "escaneo",
+}
+
+
+class JobReport:
+    """Tiempos y muestras de un trabajo, seguro entre hilos.
+
+    Las fases se acumulan: en modo paralelo, las que ocurren una vez por
+    proceso (arranque, primer progreso, finalización) suman las de todos
+    los fragmentos. Las muestras se diezman al superar ``MAX_SAMPLES``.
+    """
+
+    MAX_SAMPLES = 300
+
+    def __init__(self, input_file, parameters=None):
+        self.data = {
+            "input": str(input_file),
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "parameters": parameters or {},
+            "phases": {},
+            "fragments": [],
+            "samples": []
+        }
+        self._sample_step = 1
+        self._sample_count = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Mide el bloque ``with`` y lo suma a la fase ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name, seconds):
+        with self._lock:
+            phases = self.data["phases"]
+            phases[name] = phases.get(name, 0.0) + max(0.0, seconds)
+
+    def add_fragment(self, index, seconds, **extra):
+        with self._lock:
+            self.data["fragments"].append(dict(index=index, seconds=round(seconds, 3), **extra))
+
+    def add_sample(self, media_time, speed=None, bitrate=None, size=None):
+        """Registra una muestra de progreso (una de cada ``_sample_step``)."""
+        with self._lock:
+            self._sample_count += 1
+            if self._sample_count % self._sample_step:
+                return
+            samples = self.data["samples"]
+            samples.append({"time": round(media_time, 2), "speed": speed,
+                            "bitrate": bitrate, "size": size})
+            if len(samples) > self.MAX_SAMPLES:
+                del samples[1::2]
+                self._sample_step *= 2
+
+    def summary(self):
+        """Línea legible con las fases medidas, p. ej. para el log."""
+        with self._lock:
+            phases = dict(self.data["phases"])
+        parts = [f"{label} {phases[name]:.2f}s" for name, label in PHASES.items() if name in phases]
+        return " · ".join(parts)
+
+    def write(self, path, **result):
+        """Guarda el informe (más ``result``) como JSON; devuelve la ruta o None."""
+        with self._lock:
+            data = dict(self.data, **result)
+            phases = data["phases"]
+            order = [name for name in PHASES if name in phases]
+            data["phases"] = {name: round(phases[name], 4)
+                              for name in order + [name for name in phases if name not in PHASES]}
+            data["fragments"] = sorted(data["fragments"], key=lambda fragment: fragment["index"])
+        try:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        except OSError:
+            return None
+        return path
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Manifiesto de fragmentos por trabajo para reanudar conversiones
+- Se guarda junto a los fragmentos, en la carpeta de salida
+- Registra cada fragmento terminado con el tamaño de sus archivos y la duración
+  que escribió FFmpeg; al reanudar se compara con la duración prevista
+- Solo vale para la misma entrada (ruta, tamaño, mtime) y los mismos cortes
+  y salidas; si algo cambia, el trabajo empieza de cero
+"""
+
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from cache_audio import file_signature
+
+
+class JobManifest:
+    """Fragmentos terminados y verificados de un trabajo, seguro entre hilos.
+
+    ``params`` describe todo lo que determina el contenido de los
+    fragmentos (cortes, formatos, calidades...); un manifiesto guardado con
+    otros parámetros o para otra versión del archivo de entrada se ignora.
+    """
+
+    # Se incrementa cuando cambia el formato del archivo
+    VERSION = 2
+
+    # Diferencia admitida (segundos) entre la duración escrita y la prevista
+    DURATION_TOLERANCE = 1.0
+
+    def __init__(self, path, input_file, params):
+        self.path = Path(path)
+        signature = file_signature(input_file)
+        self.signature = list(signature) if signature else None
+        self.params = params
+        self._fragments = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Lee el manifiesto guardado; devuelve True si corresponde a este trabajo."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (self.signature is None or data.get("version") != self.VERSION
+                or data.get("input") != self.signature or data.get("params") != self.params):
+            return False
+        with self._lock:
+            self._fragments = dict(data.get("fragments") or {})
+        return True
+
+    def is_complete(self, index, files, duration):
+        """True si el fragmento está registrado, duró lo previsto (``duration``)
+        y sus archivos siguen intactos."""
+        with self._lock:
+            entry = self._fragments.get(str(index))
+        if not entry or abs(entry["duration"] - duration) > self.DURATION_TOLERANCE:
+            return False
+        for path in files:
+            try:
+                size = Path(path).stat().st_size
+            except OSError:
+                return False
+            if not size or entry["files"].get(Path(path).name) != size:
+                return False
+        return True
+
+    def mark_done(self, index, files, duration):
+        """Registra un fragmento terminado con el tamaño actual de sus archivos
+        y su duración real (la que escribió FFmpeg).
+
+        Devuelve False (sin registrar nada) si falta alguno de los archivos.
+        """
+        sizes = {}
+        for path in files:
+            try:
+                sizes[Path(path).name] = Path(path).stat().st_size
+            except OSError:
+                return False
+        with self._lock:
+            self._fragments[str(index)] = {"duration": round(duration, 3), "files": sizes}
+            self._save()
+        return True
+
+    def _save(self):
+        data = {
+            "version": self.VERSION,
+            "input": self.signature,
+            "params": self.params,
+            "fragments": self._fragments
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
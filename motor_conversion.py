@@ -0,0 +1,1405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de conversión M4A a MP3 con división automática
+- Sin dependencias de tkinter (usable en servidores sin entorno gráfico)
+- Compartido por la GUI (conversor_audio_mejorado.py) y la CLI (conversor_cli.py)
+- Modo secuencial (segmentador de FFmpeg) y modo paralelo por fragmentos
+- Información de ffprobe cacheada en disco (cache_audio.py)
+- Varias salidas (formatos/calidades) con una sola decodificación
+- Copia directa sin recodificar cuando la entrada ya es MP3
+- División M4A → M4A sin recodificar (AAC/ALAC por copia de paquetes)
+- Cortes opcionales en silencios cercanos (analisis_silencios.py)
+- Progreso publicado en un canal coalescido (canal_progreso.py)
+- Procesos FFmpeg supervisados por eventos desde un solo hilo (supervisor_ffmpeg.py)
+- Trabajos reanudables: solo se codifican los fragmentos que faltan (manifiesto_trabajo.py)
+- Informe JSON por trabajo con tiempos por fase (informe_trabajo.py)
+- Estimación del tamaño de salida y del espacio libre antes de codificar
+- Capacidades de FFmpeg cacheadas: error inmediato si falta un codificador
+- Perfiles de codificación y elección automática por muestra (perfiles_codificacion.py)
+- División por tamaño máximo de fragmento en una sola pasada (division_tamano.py)
+- MP3 intermedio cacheado: otra duración de fragmento se divide por copia (cache_intermedia.py)
+- Cortes por capítulos de audiolibros M4A/M4B (capitulos_audio.py)
+- Fragmentos conocidos por el segment list de FFmpeg, sin recorrer la carpeta de salida
+- Caché por contenido: una grabación ya convertida se copia en vez de recodificarse (cache_conversion.py)
+"""
+
+import csv
+import io
+import subprocess
+import threading
+import json
+import math
+import time
+import re
+import os
+import platform
+from concurrent.futures import as_completed
+from contextlib import nullcontext
+from functools import partial
+from pathlib import Path
+
+import analisis_silencios
+import cache_conversion
+import cache_intermedia
+import capacidades_ffmpeg
+import capitulos_audio
+import division_tamano
+import estimacion_espacio
+import perfiles_codificacion
+from cache_audio import probe_cache
+from informe_trabajo import JobReport
+from manifiesto_trabajo import JobManifest
+from supervisor_ffmpeg import default_supervisor
+
+
+OS_NAME = platform.system()
+
+
+def _popen_flags():
+    """Devuelve los flags para ocultar la consola de los subprocesos en Windows."""
+    if OS_NAME == "Windows":
+        return {'creationflags': subprocess.CREATE_NO_WINDOW}
+    return {}
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+# Duración de la última comprobación de dependencias (para los informes)
+_dependency_check_seconds = None
+
+
+def check_dependencies(log=_noop):
+    """Verifica que ffmpeg y ffprobe estén instalados.
+
+    Usa la caché de capacidades: si los ejecutables no han cambiado desde
+    la última vez, no se lanza ningún proceso.
+    """
+    global _dependency_check_seconds
+    start = time.perf_counter()
+    capabilities = ffmpeg_capabilities()
+    for name in ("ffmpeg", "ffprobe"):
+        if capabilities[name] is None:
+            log(f"Dependencia no encontrada: {name}")
+            return False
+    _dependency_check_seconds = time.perf_counter() - start
+    return True
+
+
+def ffmpeg_capabilities():
+    """Versión, codificadores, muxers y filtros de FFmpeg (cacheados)."""
+    return capacidades_ffmpeg.probe_capabilities(popen_flags=_popen_flags())
+
+
+def get_audio_info(input_file, log=_noop, use_cache=True):
+    """Obtiene información del audio usando ffprobe.
+
+    Los resultados se guardan en la caché persistente (ruta, tamaño, mtime),
+    así que un archivo sin cambios no se vuelve a analizar.
+    """
+    if use_cache:
+        cached = probe_cache().get_info(input_file)
+        if cached:
+            return cached
+
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'format=duration,size,bit_rate:stream=codec_name,sample_rate,channels'
+                         ':chapter=start_time,end_time:chapter_tags=title',
+        '-of', 'json',
+        str(input_file)
+    ]
+
+    try:
+        kwargs = {'capture_output': True, 'text': True, 'check': True}
+        kwargs.update(_popen_flags())
+
+        result = subprocess.run(cmd, timeout=15, **kwargs)
+        if not result.stdout:
+            raise ValueError("ffprobe no devolvió datos")
+
+        data = json.loads(result.stdout)
+        fmt = data.get("format")
+        if not fmt:
+            raise ValueError("ffprobe no devolvió la sección 'format'")
+
+        duration = float(fmt.get("duration", 0.0))
+        size = int(fmt.get("size", 0))
+        bitrate = int(fmt.get("bit_rate", 0) or 0)
+        streams = data.get("streams") or [{}]
+        stream = streams[0]
+
+        info = {
+            "duration": duration,
+            "size": size,
+            "bitrate": bitrate,
+            "size_mb": size / (1024 * 1024) if size else 0.0,
+            "codec": stream.get("codec_name", ""),
+            "sample_rate": int(stream.get("sample_rate", 0) or 0),
+            "channels": int(stream.get("channels", 0) or 0),
+            "chapters": capitulos_audio.parse_chapters(data)
+        }
+        if use_cache:
+            probe_cache().put_info(input_file, info)
+        return info
+    except subprocess.TimeoutExpired:
+        log("ffprobe tardó demasiado al obtener información.")
+        return None
+    except Exception as e:
+        log(f"❌ Error obteniendo info con FFprobe: {e}")
+        return None
+
+
+# Formatos de salida soportados: códec, extensión y muxer para el segmentador
+OUTPUT_FORMATS = {
+    "mp3": {"codec": "libmp3lame", "extension": "mp3", "segment_format": "mp3"},
+    "opus": {"codec": "libopus", "extension": "opus", "segment_format": "opus"},
+    "aac": {"codec": "aac", "extension": "m4a", "segment_format": "ipod",
+            "muxer_options": "movflags=+faststart"},
+    # Copia de paquetes AAC/ALAC: cada fragmento es un MP4 completo con su
+    # propio moov (al principio) y marcas de tiempo que empiezan en cero
+    "m4a": {"codec": "copy", "extension": "m4a", "segment_format": "ipod",
+            "muxer_options": "movflags=+faststart"},
+}
+
+# Códecs que se pueden meter en un .m4a sin recodificar
+M4A_COPY_CODECS = {"aac", "alac"}
+
+
+def make_output(fmt="mp3", quality=None, bitrate=None, subdir="", profile=None):
+    """Describe una salida: formato, calidad VBR (-q:a) o bitrate (-b:a) y subcarpeta.
+
+    ``profile`` (solo MP3) aplica un perfil de perfiles_codificacion.py:
+    canales, frecuencia, algoritmo de LAME y, si no se indican, calidad o
+    bitrate. ``auto`` se resuelve en el motor tras probar la entrada.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Formato de salida no soportado: {fmt}")
+    output = dict(OUTPUT_FORMATS[fmt])
+    settings = {"channels": None, "sample_rate": None, "compression_level": None}
+    if profile is not None:
+        if fmt != "mp3":
+            raise ValueError("Los perfiles de codificación solo se aplican a MP3")
+        settings = perfiles_codificacion.profile_settings(profile)
+        if quality is None and bitrate is None:
+            quality, bitrate = settings["quality"], settings["bitrate"]
+    output.update({"format": fmt, "quality": quality, "bitrate": bitrate, "subdir": subdir,
+                   "profile": profile, "channels": settings["channels"],
+                   "sample_rate": settings["sample_rate"],
+                   "compression_level": settings["compression_level"]})
+    if quality is None and bitrate is None and fmt == "mp3":
+        output["quality"] = 2
+    return output
+
+
+def parse_output_spec(spec):
+    """Convierte 'mp3:q=2', 'mp3:p=speech', 'opus:b=64k' o 'aac:b=96k:dir=aac' en una salida."""
+    fmt, *options = spec.split(":")
+    params = {}
+    for option in options:
+        key, _, value = option.partition("=")
+        params[key.strip()] = value.strip()
+    quality = int(params["q"]) if "q" in params else None
+    bitrate = params.get("b")
+    profile = params.get("p")
+    subdir = params.get("dir")
+    if subdir is None:
+        if profile is not None:
+            subdir = f"{fmt}_{profile}"
+        else:
+            subdir = f"{fmt}_q{quality}" if quality is not None else f"{fmt}_{bitrate or 'default'}"
+    return make_output(fmt.strip().lower(), quality=quality, bitrate=bitrate, subdir=subdir,
+                       profile=profile)
+
+
+def _muxer_args(output, segmenter):
+    """Opciones propias del muxer de una salida (p. ej. movflags para MP4)."""
+    options = output.get("muxer_options")
+    if not options:
+        return []
+    if segmenter:
+        return ["-segment_format_options", options]
+    args = []
+    for option in options.split(":"):
+        key, _, value = option.partition("=")
+        args += [f"-{key}", value]
+    return args
+
+
+def _encoder_args(output, threads):
+    """Argumentos de FFmpeg para codificar una salida (antes de su muxer)."""
+    if output.get("copy") or output["codec"] == "copy":
+        # Copia de paquetes: cada paquete MP3 es un frame completo, así que
+        # los cortes caen siempre en límites de frame. El muxer mp3 escribe
+        # una cabecera Xing/LAME nueva en cada fragmento (write_xing=1 por
+        # defecto) con su número de frames real, y la duración sale exacta.
+        return ["-vn", "-map", "0:a", "-acodec", "copy"]
+
+    args = ["-vn", "-map", "0:a", "-acodec", output["codec"]]
+    if output["quality"] is not None:
+        args += ["-q:a", str(output["quality"])]
+    if output["bitrate"]:
+        args += ["-b:a", str(output["bitrate"])]
+    if output.get("channels"):
+        args += ["-ac", str(output["channels"])]
+    if output.get("sample_rate"):
+        args += ["-ar", str(output["sample_rate"])]
+    if output.get("compression_level") is not None:
+        args += ["-compression_level", str(output["compression_level"])]
+    args += ["-threads", str(threads)]
+    return args
+
+
+def read_segment_list(path, offset=0):
+    """Entradas nuevas de un segment list CSV de FFmpeg desde ``offset``.
+
+    Devuelve ``([(nombre, inicio, fin)], nuevo_offset)``; una línea a medio
+    escribir se deja para la siguiente lectura.
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except OSError:
+        return [], offset
+    size = data.rfind(b"\n") + 1
+    entries = []
+    for row in csv.reader(io.StringIO(data[:size].decode("utf-8", errors="replace"))):
+        try:
+            entries.append((row[0], float(row[1]), float(row[2])))
+        except (IndexError, ValueError):
+            continue
+    return entries, offset + size
+
+
+def safe_base_name(input_file):
+    """Sanitiza el nombre del archivo de entrada para usarlo en las salidas."""
+    safe_name = re.sub(r'[^A-Za-z0-9._-]', '_', Path(input_file).stem)
+    return safe_name.replace('%', '_')
+
+
+class ConversionEngine:
+    """Convierte un archivo de audio a fragmentos MP3 sin depender de la GUI.
+
+    El progreso se comunica mediante callbacks que se invocan desde el hilo
+    de trabajo; quien los registre es responsable de pasarlos a su propio
+    hilo (p. ej. ``root.after`` en tkinter).
+    """
+
+    def __init__(self, input_file, output_dir, chunk_duration=600, quality=2,
+                 parallel=False, max_workers=None, total_duration=None,
+                 outputs=None, stream_copy=True, split_points=None, silence_split=False,
+                 silence_options=None, resume=True, report=True, space_check=True,
+                 profile=None, target_bitrate=None, target_size=None, max_fragment_bytes=None,
+                 intermediate_cache=True, chapter_split=None, conversion_cache=True,
+                 progress_channel=None, job_id=None,
+                 on_progress=None, on_fragment=None, on_log=None):
+        self.input_file = Path(input_file)
+        self.output_dir = Path(output_dir)
+        self.chunk_duration = chunk_duration
+        self.quality = quality
+        self.parallel = parallel
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.total_duration = total_duration or 0
+        self.base_name = safe_base_name(self.input_file)
+
+        # Salidas: por defecto un único MP3 en la carpeta de salida. Con
+        # varias salidas, FFmpeg decodifica una vez y alimenta a todos los
+        # codificadores; cada una va a su propia subcarpeta.
+        # Con ``profile`` la salida por defecto usa ese perfil en vez de ``quality``
+        self.profile = profile
+        if not outputs:
+            outputs = [make_output("mp3", profile=profile) if profile
+                       else make_output("mp3", quality=quality)]
+        self.outputs = [dict(output) for output in outputs]
+
+        # Perfil automático: objetivo de bitrate ("96k") o de tamaño total (bytes)
+        self.target_bitrate = target_bitrate
+        self.target_size = target_size
+        self.profile_results = None
+
+        # División por tamaño: cada fragmento termina antes de pasar de
+        # ``max_fragment_bytes`` (sustituye a chunk_duration al cortar)
+        self.max_fragment_bytes = max_fragment_bytes
+
+        # MP3 intermedio completo: tras una codificación entera se guarda en
+        # la caché y las siguientes divisiones se hacen por copia desde él.
+        # ``source_file`` es lo que lee FFmpeg (la entrada o ese intermedio).
+        self.use_intermediate = intermediate_cache
+        self.intermediate_variant = None
+        self.source_file = self.input_file
+        self._full_pass = False
+
+        # Si la entrada ya es MP3, las salidas MP3 se dividen sin recodificar
+        self.stream_copy = stream_copy
+        self.info = None
+
+        # Cortes explícitos (segundos) o calculados buscando silencios cerca
+        # de cada corte nominal; sin ellos se corta cada chunk_duration
+        self.split_points = list(split_points) if split_points else None
+        self.silence_split = silence_split
+        self.silence_options = dict(silence_options or {})
+
+        # Caché por contenido: la misma entrada (aunque cambie de nombre) con
+        # los mismos parámetros reutiliza los fragmentos ya convertidos
+        self.use_conversion_cache = conversion_cache
+        self.conversion_key = None
+        self.from_conversion_cache = False
+
+        # Cortes por capítulos: "each" (uno por capítulo) o "group" (capítulos
+        # consecutivos hasta chunk_duration); sustituyen a los de silencio
+        self.chapter_split = chapter_split
+
+        # Reanudación: el manifiesto registra los fragmentos terminados y un
+        # nuevo intento solo codifica los que faltan
+        self.resume = resume
+        self.manifest = None
+        self.done_fragments = set()
+        self.reused_fragments = 0
+
+        # Fragmentos escritos en esta ejecución, por salida: índice ->
+        # {"file", "start", "end"}. Salen del segment list de FFmpeg (o del
+        # divisor por tamaño), así que no hace falta recorrer la carpeta.
+        self.segments = [{} for _ in self.outputs]
+
+        # Informe JSON con tiempos por fase junto a los fragmentos
+        self.write_report = report
+        self.report = None
+
+        # Comprobación de espacio: se rechaza el trabajo si no cabe
+        self.space_check = space_check
+        self.estimate = None
+
+        # Callbacks: progreso (0-1, segundos), fragmento (actual, total) y log
+        self.on_progress = on_progress or _noop
+        self.on_fragment = on_fragment or _noop
+        self.on_log = on_log or _noop
+
+        # Canal de progreso coalescido: se publica el último estado del
+        # trabajo y cada consumidor lo muestrea a su ritmo
+        self.progress_channel = progress_channel
+        self.job_id = job_id or str(self.input_file)
+
+        self.current_time = 0
+        self.current_progress = 0
+        self.is_processing = False
+        # Parada limpia pedida (se termina el fragmento en curso) y pausa
+        self.stopping = False
+        self.paused = False
+        self.supervisor = default_supervisor()
+        self.ffmpeg_tasks = set()
+        self._lock = threading.Lock()
+
+    @property
+    def total_fragments(self):
+        if self.total_duration <= 0:
+            return 0
+        if self.split_points is not None:
+            return len(self.split_points) + 1
+        return math.ceil(self.total_duration / self.chunk_duration)
+
+    def fragment_ranges(self):
+        """Lista de (inicio, fin) en segundos de cada fragmento."""
+        if self.split_points is not None:
+            bounds = [0.0] + self.split_points + [self.total_duration]
+        else:
+            bounds = [index * self.chunk_duration for index in range(self.total_fragments)]
+            bounds.append(self.total_duration)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _segment_args(self, first=0):
+        """Opciones del segmentador: cortes explícitos o duración fija.
+
+        Con ``first`` > 0 la entrada empieza en el inicio de ese fragmento,
+        así que los cortes se desplazan y la numeración continúa desde él.
+        """
+        args = ["-segment_start_number", str(first)] if first else []
+        if self.split_points is not None:
+            offset = self.fragment_ranges()[first][0]
+            points = [point - offset for point in self.split_points[first:]]
+            if points:
+                return args + ["-segment_times", ",".join(f"{point:.3f}" for point in points)]
+            # Solo falta el último fragmento: un corte más allá del final
+            return args + ["-segment_time", str(self.total_duration)]
+        return args + ["-segment_time", str(self.chunk_duration)]
+
+    def fragment_files(self, index):
+        """Archivos (uno por salida) que forman el fragmento ``index``."""
+        return [
+            self.output_path(output) / f"{index:03d}_{self.base_name}.{output['extension']}"
+            for output in self.outputs
+        ]
+
+    def _plan_resume(self):
+        """Carga el manifiesto y averigua qué fragmentos ya están terminados."""
+        self.done_fragments = set()
+        if not self.resume or self.total_duration <= 0:
+            self.manifest = None
+            return
+        ranges = self.fragment_ranges()
+        params = {
+            "ranges": [[round(start, 3), round(end, 3)] for start, end in ranges],
+            "outputs": [[output["format"], output["quality"], output["bitrate"],
+                         output["subdir"], bool(output.get("copy")), output.get("profile"),
+                         output.get("channels"), output.get("sample_rate")]
+                        for output in self.outputs]
+        }
+        self.manifest = JobManifest(self.output_dir / f".{self.base_name}.manifiesto.json",
+                                    self.input_file, params)
+        if not self.manifest.load():
+            return
+        self.done_fragments = {
+            index for index, (start, end) in enumerate(ranges)
+            if self.manifest.is_complete(index, self.fragment_files(index), end - start)
+        }
+        self.reused_fragments = len(self.done_fragments)
+        if self.done_fragments:
+            self.on_log(f"♻️ Reanudando: {len(self.done_fragments)} de {len(ranges)} "
+                        f"fragmentos ya estaban completos")
+
+    def _mark_done(self, index, duration):
+        """Registra un fragmento cerrado con ``duration``, lo que FFmpeg escribió de él."""
+        # El segmentador puede dejar un fragmento más si la duración real
+        # supera a la de ffprobe; no tiene rango en el manifiesto
+        if (self.manifest is None or duration is None or index in self.done_fragments
+                or index >= self.total_fragments):
+            return
+        if self.manifest.mark_done(index, self.fragment_files(index), duration):
+            self.done_fragments.add(index)
+
+    def _plan_chapter_split(self):
+        """Convierte la tabla de capítulos de ffprobe en cortes del segmentador."""
+        if not self.chapter_split or self.split_points is not None or self.total_duration <= 0:
+            return
+        if self.max_fragment_bytes:
+            self.on_log("ℹ️ División por tamaño: se ignoran los capítulos")
+            return
+        chapters = (self.info or {}).get("chapters") or []
+        if len(chapters) < 2:
+            self.on_log("⚠️ La entrada no tiene capítulos: se corta por duración")
+            return
+        max_duration = self.chunk_duration if self.chapter_split == "group" else None
+        self.split_points = capitulos_audio.chapter_split_points(
+            chapters, self.total_duration, max_duration)
+        self.on_log(f"📖 {len(chapters)} capítulos → {self.total_fragments} fragmentos")
+        titles = capitulos_audio.fragment_titles(chapters, self.fragment_ranges())
+        for index, names in enumerate(titles):
+            if names:
+                shown = ", ".join(names[:3]) + (f" y {len(names) - 3} más" if len(names) > 3 else "")
+                self.on_log(f"   {index + 1:03d}: {shown}")
+
+    def _plan_silence_split(self):
+        """Calcula los cortes en silencios (una pasada de análisis, cacheada)."""
+        if not self.silence_split or self.split_points is not None or self.total_duration <= 0:
+            return
+        self.on_log("🤫 Buscando silencios cerca de cada corte...")
+        with self._phase("analisis_silencios"):
+            self.split_points = analisis_silencios.find_split_points(
+                self.input_file,
+                self.chunk_duration,
+                self.total_duration,
+                log=self.on_log,
+                popen_flags=_popen_flags(),
+                should_stop=lambda: not self.is_processing,
+                **self.silence_options
+            )
+
+    def run(self):
+        """Ejecuta la conversión y devuelve un dict con el resultado.
+
+        Claves: ``ok``, ``cancelled``, ``message``, ``elapsed`` y ``files``.
+        """
+        start_time = time.time()
+        self.is_processing = True
+        self.stopping = False
+        self.segments = [{} for _ in self.outputs]
+        self.report = JobReport(self.input_file, self._report_parameters()) if self.write_report else None
+        if self.report is not None and _dependency_check_seconds is not None:
+            self.report.add_phase("dependencias", _dependency_check_seconds)
+
+        with self._phase("sondeo"):
+            self.info = get_audio_info(self.input_file, log=self.on_log)
+        if self.info and not self.total_duration:
+            self.total_duration = self.info["duration"]
+
+        try:
+            if self.total_duration > 0 and any(output.get("profile") == perfiles_codificacion.AUTO
+                                               for output in self.outputs):
+                with self._phase("seleccion_perfil"):
+                    self._plan_auto_profile()
+            self._plan_stream_copy()
+            self._plan_intermediate()
+            error = self._check_size_split() or self._check_capabilities() or self._check_m4a_copy()
+            restored = False
+            if not error:
+                self._plan_chapter_split()
+                self._plan_silence_split()
+                self._plan_resume()
+                with self._phase("cache_conversion"):
+                    restored = self._restore_conversion()
+                if not restored:
+                    error = self._preflight()
+            if not error and self.is_processing:
+                self._publish(status="pausado" if self.paused else "procesando",
+                              duration=self.total_duration,
+                              total_fragments=self.total_fragments, parallel=self.parallel)
+                if restored:
+                    self.on_progress(1.0, self.total_duration)
+                else:
+                    if self.total_fragments and len(self.done_fragments) == self.total_fragments:
+                        self.on_log("✅ Todos los fragmentos ya estaban completos")
+                    else:
+                        with self._phase("codificacion"):
+                            if self.max_fragment_bytes:
+                                error = self._run_size_split()
+                            else:
+                                error = self._run_parallel() if self.parallel else self._run_segmenter()
+                        if not error and self.is_processing and self._full_pass:
+                            with self._phase("intermedio"):
+                                self._store_intermediate()
+                    if not error and self.is_processing:
+                        with self._phase("cache_conversion"):
+                            self._store_conversion()
+        except Exception as e:
+            error = str(e) if self.is_processing else None
+
+        cancelled = not self.is_processing and not error
+        self.is_processing = False
+        elapsed = time.time() - start_time
+
+        if cancelled and not error:
+            error = ("Conversión detenida al cerrar el fragmento en curso" if self.stopping
+                     else "Conversión detenida por el usuario")
+        if error:
+            self._publish(status="cancelado" if cancelled else "error", elapsed=elapsed)
+            # Tras una parada limpia quedan fragmentos completos (los
+            # incompletos ya se borraron); se listan solo esos
+            files = self.output_files() if cancelled and self.stopping else []
+            result = {"ok": False, "cancelled": cancelled, "message": error,
+                      "elapsed": elapsed, "files": files}
+        else:
+            with self._phase("escaneo_salidas"):
+                files = self.output_files()
+            self._publish(status="ok", progress=1.0, elapsed=elapsed)
+            result = {
+                "ok": True,
+                "cancelled": False,
+                "message": f"Conversión completada en {elapsed:.1f}s",
+                "elapsed": elapsed,
+                "files": files
+            }
+        result["report"] = self._finish_report(result)
+        return result
+
+    def _phase(self, name):
+        """Contexto que mide una fase del informe (nada si no hay informe)."""
+        return self.report.phase(name) if self.report is not None else nullcontext()
+
+    def _report_parameters(self):
+        return {
+            "chunk_duration": self.chunk_duration,
+            "parallel": self.parallel,
+            "max_workers": self.max_workers if self.parallel else 1,
+            "outputs": [{key: output.get(key) for key in ("format", "quality", "bitrate", "subdir",
+                                                          "profile")}
+                        for output in self.outputs],
+            "silence_split": self.silence_split,
+            "chapter_split": self.chapter_split,
+            "resume": self.resume,
+            "max_fragment_bytes": self.max_fragment_bytes
+        }
+
+    def _finish_report(self, result):
+        """Escribe el informe junto a los fragmentos y resume las fases en el log."""
+        if self.report is None:
+            return None
+        summary = self.report.summary()
+        if summary:
+            self.on_log(f"⏱️ Fases: {summary}")
+        stream_copy = any(output.get("copy") for output in self.outputs)
+        path = self.report.write(
+            self.output_dir / f"informe_{self.base_name}.json",
+            ok=result["ok"],
+            cancelled=result["cancelled"],
+            message=result["message"],
+            elapsed=round(result["elapsed"], 3),
+            duration=self.total_duration,
+            speed=self.total_duration / result["elapsed"] if result["elapsed"] > 0 else 0.0,
+            stream_copy=stream_copy,
+            fragments_reused=self.reused_fragments,
+            estimate=self.estimate,
+            parameters=self._report_parameters(),
+            profile_benchmark=self.profile_results,
+            from_intermediate=self.source_file != self.input_file,
+            from_conversion_cache=self.from_conversion_cache,
+            files=[{"name": f.name, "size": f.stat().st_size} for f in result["files"]]
+        )
+        return path
+
+    def _report_task(self, task, index=None):
+        """Pasa al informe los tiempos de un proceso FFmpeg ya terminado."""
+        times = task.times
+        if self.report is None or "spawned" not in times:
+            return
+        self.report.add_phase("arranque_ffmpeg", times["spawned"] - times["spawn_started"])
+        if "first_progress" in times:
+            self.report.add_phase("primer_progreso", times["first_progress"] - times["spawned"])
+            self.report.add_phase("finalizacion", times["finished"] - times["last_progress"])
+        if index is not None:
+            self.report.add_fragment(index, times["finished"] - times["spawned"])
+
+    def _preflight(self):
+        """Estima lo que queda por escribir y comprueba el espacio libre.
+
+        Devuelve un mensaje de error si la salida estimada no cabe.
+        """
+        if not self.space_check or self.total_duration <= 0:
+            return None
+        ranges = [bounds for index, bounds in enumerate(self.fragment_ranges())
+                  if index not in self.done_fragments]
+        estimate = estimacion_espacio.estimate_output(self.info, self.outputs, ranges,
+                                                      stream_copy=self.stream_copy)
+        check = estimacion_espacio.check_space(self.output_dir, estimate["total"])
+        self.estimate = dict(check, fragments=estimate["fragments"])
+        message = estimacion_espacio.space_message(check)
+        if check["status"] == "insuficiente":
+            return message
+        self.on_log(("💾 " if check["status"] == "ok" else "⚠️ ") + message)
+        return None
+
+    def _publish(self, **fields):
+        if self.progress_channel is not None:
+            self.progress_channel.publish(self.job_id, **fields)
+
+    def _plan_stream_copy(self):
+        """Marca para copia directa las salidas MP3 cuando la entrada es MP3."""
+        input_is_mp3 = bool(self.info) and self.info.get("codec") == "mp3"
+        for output in self.outputs:
+            if output["format"] != "mp3":
+                continue
+            # Un perfil que cambia canales o frecuencia obliga a recodificar
+            resample = output.get("channels") or output.get("sample_rate")
+            output["copy"] = self.stream_copy and input_is_mp3 and not resample
+            if output["copy"]:
+                self.on_log("⚡ Entrada MP3: división por copia directa, sin recodificar")
+
+    def _plan_auto_profile(self):
+        """Prueba los perfiles con una muestra de la entrada y aplica el elegido."""
+        profile, self.profile_results = perfiles_codificacion.choose_profile(
+            self.input_file,
+            self.total_duration,
+            lambda name: _encoder_args(make_output("mp3", profile=name), 1),
+            target_bitrate=self.target_bitrate,
+            target_size=self.target_size,
+            popen_flags=_popen_flags(),
+            log=self.on_log
+        )
+        self.on_log(f"🎚️ Perfil elegido: {profile} ({perfiles_codificacion.PROFILES[profile]['label']})")
+        self.outputs = [
+            make_output("mp3", subdir=output["subdir"], profile=profile)
+            if output.get("profile") == perfiles_codificacion.AUTO else output
+            for output in self.outputs
+        ]
+
+    def _plan_intermediate(self):
+        """Usa el MP3 intermedio de esta entrada si está en la caché.
+
+        Con él, la división es una copia de tramas en una sola pasada (sin
+        modo paralelo ni reanudación, que no hacen falta a esa velocidad).
+        """
+        self.intermediate_variant = None
+        if not self.use_intermediate or self.total_duration <= 0 or len(self.outputs) != 1:
+            return
+        output = self.outputs[0]
+        if output["format"] != "mp3" or output.get("copy"):
+            return
+        variant = cache_intermedia.encoder_variant(output)
+        cached = cache_intermedia.intermediate_cache().lookup(self.input_file, variant)
+        if cached is None:
+            # Sin intermedio: se guardará uno si esta codificación es completa
+            self.intermediate_variant = variant
+            return
+        self.source_file = cached
+        output["copy"] = True
+        self.parallel = False
+        self.resume = False
+        self.on_log("💽 MP3 intermedio en caché: división por copia, sin recodificar")
+
+    def _store_intermediate(self):
+        """Une por copia los fragmentos recién codificados en el MP3 intermedio."""
+        files = [self.segments[0][index]["file"] for index in sorted(self.segments[0])]
+        if not files or not all(path.exists() for path in files):
+            return
+        cache = cache_intermedia.intermediate_cache()
+        tmp_path = cache.reserve()
+        list_path = tmp_path.with_suffix(".txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in files:
+                escaped = str(path.resolve()).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "error",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", str(list_path),
+            "-map", "0:a",
+            "-c", "copy",
+            "-f", "mp3",
+            "-y",
+            str(tmp_path)
+        ]
+        task = self._submit(cmd, None, partial(self._log_errors, "ERROR"))
+        try:
+            outcome = task.result()
+        finally:
+            self._release(task)
+            cache.remove_file(list_path)
+        if self._task_error(outcome) or outcome["cancelled"] or not self.is_processing:
+            cache.remove_file(tmp_path)
+            return
+        if cache.store(self.input_file, self.intermediate_variant, tmp_path, self.total_duration):
+            self.on_log("💽 MP3 intermedio guardado: otra duración de fragmento no recodificará")
+
+    def _conversion_params(self):
+        """Parámetros que, junto al contenido, determinan los fragmentos escritos."""
+        return {
+            "version": cache_conversion.ConversionCache.VERSION,
+            "outputs": [[output.get(field) for field in cache_conversion.OUTPUT_FIELDS]
+                        for output in self.outputs],
+            "stream_copy": self.stream_copy,
+            "max_fragment_bytes": self.max_fragment_bytes,
+            "ranges": None if self.max_fragment_bytes else
+            [[round(start, 3), round(end, 3)] for start, end in self.fragment_ranges()]
+        }
+
+    def _restore_conversion(self):
+        """Enlaza los fragmentos de una conversión idéntica ya guardada; True si la hubo."""
+        self.conversion_key = None
+        self.from_conversion_cache = False
+        if not self.use_conversion_cache or self.total_duration <= 0:
+            return False
+        try:
+            content = cache_conversion.hash_cache().hash_for(self.input_file)
+        except OSError as e:
+            self.on_log(f"⚠️ No se pudo calcular la huella de la entrada: {e}")
+            return False
+        self.conversion_key = cache_conversion.conversion_key(content, self._conversion_params())
+        cached = cache_conversion.conversion_cache().lookup(self.conversion_key)
+        if cached is None or len(cached) != len(self.outputs):
+            return False
+
+        cloned = 0
+        try:
+            for position, fragments in enumerate(cached):
+                output = self.outputs[position]
+                output_dir = self.output_path(output)
+                output_dir.mkdir(parents=True, exist_ok=True)
+                for fragment in fragments:
+                    path = output_dir / f"{fragment['index']:03d}_{self.base_name}.{output['extension']}"
+                    cloned += cache_conversion.clone_or_copy(fragment["file"], path)
+                    self._record_segment(position, path, fragment["start"], fragment["end"],
+                                         fragment["index"])
+        except OSError as e:
+            self.on_log(f"⚠️ No se pudo reutilizar la conversión en caché: {e}")
+            self.segments = [{} for _ in self.outputs]
+            return False
+
+        total = sum(len(fragments) for fragments in cached)
+        self.from_conversion_cache = True
+        self.on_log(f"♻️ Esta grabación ya estaba convertida: {total} fragmentos "
+                    f"({cloned} clonados, {total - cloned} copiados) sin recodificar")
+        return True
+
+    def _store_conversion(self):
+        """Guarda los fragmentos de esta conversión en la caché por contenido."""
+        if self.conversion_key is None:
+            return
+        outputs = [self.output_fragments(position) for position in range(len(self.outputs))]
+        if not all(outputs) or not all(fragment["file"].exists()
+                                       for fragments in outputs for fragment in fragments):
+            return
+        cache_conversion.conversion_cache().store(self.conversion_key, outputs)
+
+    def _check_capabilities(self):
+        """Falla de inmediato si FFmpeg no tiene un codificador o muxer necesario."""
+        segmenter = not self.parallel and not self.max_fragment_bytes
+        missing = capacidades_ffmpeg.missing_requirements(
+            ffmpeg_capabilities(), self.outputs, segmenter=segmenter)
+        return "; ".join(missing) or None
+
+    def _check_size_split(self):
+        """La división por tamaño admite una sola salida MP3 y no se reanuda."""
+        if not self.max_fragment_bytes:
+            return None
+        if len(self.outputs) != 1 or self.outputs[0]["format"] != "mp3":
+            return "La división por tamaño solo admite una única salida MP3"
+        if self.max_fragment_bytes < division_tamano.MIN_FRAGMENT_BYTES:
+            return (f"El tamaño máximo de fragmento debe ser de al menos "
+                    f"{division_tamano.MIN_FRAGMENT_BYTES // 1024} KB")
+        # Los cortes dependen de los bytes escritos: no hay cortes en
+        # silencios ni fragmentos previos que conservar
+        if self.silence_split or self.split_points is not None:
+            self.on_log("ℹ️ División por tamaño: se ignoran los cortes en silencios")
+            self.silence_split = False
+            self.split_points = None
+        if self.parallel:
+            self.on_log("ℹ️ División por tamaño: una sola pasada, sin modo paralelo")
+        self.resume = False
+        return None
+
+    def _check_m4a_copy(self):
+        """El modo M4A sin recodificar solo sirve si la entrada es AAC o ALAC."""
+        if not any(output["format"] == "m4a" for output in self.outputs):
+            return None
+        codec = self.info.get("codec") if self.info else None
+        if codec not in M4A_COPY_CODECS:
+            return (f"La salida M4A sin recodificar requiere entrada AAC o ALAC "
+                    f"(códec detectado: {codec or 'desconocido'})")
+        return None
+
+    def stop(self, graceful=False):
+        """Solicita detención sin esperar a que los procesos terminen.
+
+        Normal: cancela todos los procesos de ffmpeg (el fragmento a medio
+        escribir se pierde). Con ``graceful`` se conserva el trabajo en curso:
+        el segmentador para al cerrar el fragmento actual, en paralelo acaban
+        los fragmentos ya lanzados y en la división por tamaño FFmpeg cierra
+        el flujo y se guarda el fragmento abierto. Una segunda llamada sin
+        ``graceful`` detiene en el acto.
+        """
+        with self._lock:
+            tasks = list(self.ffmpeg_tasks)
+        if graceful and tasks and self.is_processing:
+            self.stopping = True
+            self.unpause()
+            if self.max_fragment_bytes:
+                self.is_processing = False
+                for task in tasks:
+                    self.supervisor.quit(task)
+            elif self.parallel:
+                for task in tasks:
+                    if task.process is None:
+                        self.supervisor.cancel(task)
+            self.on_log("⏹️ Deteniendo al cerrar el fragmento en curso...")
+            return
+        self.stopping = False
+        self.is_processing = False
+        for task in tasks:
+            self.supervisor.cancel(task)
+
+    def pause(self):
+        """Suspende los procesos de ffmpeg del trabajo (también los que aún esperan)."""
+        if self.paused:
+            return
+        self.paused = True
+        with self._lock:
+            tasks = list(self.ffmpeg_tasks)
+        for task in tasks:
+            self.supervisor.pause(task)
+        self._publish(status="pausado")
+        self.on_log("⏸️ Conversión en pausa")
+
+    def unpause(self):
+        """Reanuda los procesos suspendidos con ``pause``."""
+        if not self.paused:
+            return
+        self.paused = False
+        with self._lock:
+            tasks = list(self.ffmpeg_tasks)
+        for task in tasks:
+            self.supervisor.resume(task)
+        self._publish(status="procesando")
+        self.on_log("▶️ Conversión reanudada")
+
+    def output_path(self, output):
+        """Carpeta donde se escriben los fragmentos de una salida."""
+        return self.output_dir / output["subdir"] if output["subdir"] else self.output_dir
+
+    def output_files(self):
+        """Lista ordenada de fragmentos de esta entrada.
+
+        Son los registrados en esta ejecución más los reutilizados al
+        reanudar; fragmentos antiguos de la carpeta no se cuelan.
+        """
+        files = []
+        for position in range(len(self.outputs)):
+            files.extend(fragment["file"] for fragment in self.output_fragments(position))
+        return files
+
+    def output_fragments(self, position):
+        """Fragmentos (``index``, ``file``, ``start``, ``end``) de una salida, en orden."""
+        with self._lock:
+            found = {index: dict(segment, index=index)
+                     for index, segment in self.segments[position].items()}
+        ranges = self.fragment_ranges() if self.done_fragments else []
+        for index in self.done_fragments:
+            if index not in found:
+                start, end = ranges[index]
+                found[index] = {"index": index, "file": self.fragment_files(index)[position],
+                                "start": start, "end": end}
+        return [found[index] for index in sorted(found)]
+
+    def _submit(self, cmd, on_progress, on_line, group_limit=None, on_data=None):
+        """Lanza ``cmd`` en el supervisor; los callbacks corren en su hilo."""
+        task = self.supervisor.submit(
+            cmd,
+            on_progress=on_progress,
+            on_line=on_line,
+            on_data=on_data,
+            popen_kwargs=_popen_flags(),
+            group=id(self) if group_limit else None,
+            group_limit=group_limit
+        )
+        with self._lock:
+            self.ffmpeg_tasks.add(task)
+        # stop() o pause() pudieron llegar entre la comprobación y el registro
+        if not self.is_processing:
+            self.supervisor.cancel(task)
+        elif self.paused:
+            self.supervisor.pause(task)
+        return task
+
+    def _release(self, task):
+        with self._lock:
+            self.ffmpeg_tasks.discard(task)
+
+    def _task_error(self, outcome):
+        """Traduce el resultado de un FFmpegTask a un mensaje de error o None."""
+        if outcome["cancelled"] or not self.is_processing:
+            return None
+        if outcome.get("error"):
+            return f"No se pudo iniciar ffmpeg: {outcome['error']}"
+        if outcome["timed_out"]:
+            return "Timeout esperando finalización de FFmpeg"
+        if outcome["returncode"] != 0:
+            return f"FFmpeg terminó con código {outcome['returncode']}"
+        return None
+
+    def _log_errors(self, prefix, line):
+        if "error" in line.lower():
+            self.on_log(f"{prefix}: {line}")
+
+    def _run_segmenter(self):
+        """Un único FFmpeg con el segmentador; devuelve un mensaje de error o None.
+
+        Al reanudar se empieza en el primer fragmento que falta (los
+        posteriores se vuelven a codificar, el segmentador es continuo).
+        """
+        total_fragments = self.total_fragments
+        pending = [index for index in range(total_fragments) if index not in self.done_fragments]
+        first = pending[0] if pending and self.done_fragments else 0
+        offset = self.fragment_ranges()[first][0] if first else 0.0
+        self._full_pass = first == 0 and self.intermediate_variant is not None
+
+        cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "info",
+        ]
+        if first:
+            cmd += ["-ss", f"{offset:.3f}"]
+        cmd += [
+            "-i", str(self.source_file),
+            "-progress", "pipe:1",
+            "-nostats",
+            "-y"
+        ]
+        # Cada salida escribe su segment list: FFmpeg añade una línea
+        # (nombre, inicio, fin) al cerrar cada fragmento
+        segment_lists = []
+        for position, output in enumerate(self.outputs):
+            output_dir = self.output_path(output)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            segment_list = output_dir / f".{self.base_name}.{position}.segmentos.csv"
+            segment_lists.append(segment_list)
+            cmd += _encoder_args(output, threads=0)
+            cmd += [
+                "-f", "segment",
+                *self._segment_args(first),
+                "-segment_format", output["segment_format"],
+                "-segment_list", str(segment_list),
+                "-segment_list_type", "csv",
+            ]
+            cmd += _muxer_args(output, segmenter=True)
+            cmd += [
+                "-reset_timestamps", "1",
+                str(output_dir / f"%03d_{self.base_name}.{output['extension']}")
+            ]
+
+        list_offsets = [0] * len(segment_lists)
+        reported = set()
+        unfinished = []   # Cerrados después de pedir la parada: incompletos
+        fragment = first + 1
+        # (reloj, instante del audio) de cada registro de progreso: el
+        # segment list solo se lee al llegar uno, así que varios fragmentos
+        # pueden aparecer juntos
+        progress_marks = [(time.perf_counter(), offset)]
+        quit_sent = False
+        task = None   # on_progress puede llegar antes de que _submit devuelva
+
+        def wall_time_at(position):
+            """Reloj en que FFmpeg pasó ``position``, interpolado entre registros."""
+            previous = progress_marks[0]
+            for mark in progress_marks:
+                if mark[1] >= position:
+                    if mark[1] <= previous[1]:
+                        return mark[0]
+                    share = (position - previous[1]) / (mark[1] - previous[1])
+                    return previous[0] + share * (mark[0] - previous[0])
+                previous = mark
+            # Más allá del último registro (el trailer): ahora
+            return time.perf_counter()
+
+        def poll_segments(complete=True):
+            """Registra los fragmentos cerrados desde la última lectura.
+
+            Con ``complete`` se dan por terminados en el manifiesto.
+            """
+            nonlocal fragment
+            closed = self._read_segments(segment_lists, list_offsets, offset, reported)
+            if quit_sent:
+                unfinished.extend(closed)
+                return closed
+            for index in closed:
+                if self.report is not None:
+                    segment = self.segments[0][index]
+                    seconds = wall_time_at(segment["end"]) - wall_time_at(segment["start"])
+                    self.report.add_fragment(index, max(seconds, 0.0),
+                                             duration=round(segment["end"] - segment["start"], 3))
+                if complete:
+                    with self._lock:
+                        duration = min(segments[index]["end"] - segments[index]["start"]
+                                       for segments in self.segments)
+                    self._mark_done(index, duration)
+            if closed:
+                fragment = min(max(fragment, closed[-1] + 2), total_fragments)
+                # Los registros anteriores al último corte ya no hacen falta
+                last_end = self.segments[0][closed[-1]]["end"]
+                while len(progress_marks) > 1 and progress_marks[1][1] <= last_end:
+                    progress_marks.pop(0)
+            return closed
+
+        def on_progress(record):
+            nonlocal quit_sent
+            if record.time is None or self.total_duration <= 0:
+                return
+
+            progress_marks.append((time.perf_counter(), offset + record.time))
+            closed = poll_segments()
+            self.current_time = offset + record.time
+            self.current_progress = min(1.0, self.current_time / self.total_duration)
+            self._publish(time=self.current_time, progress=self.current_progress,
+                          speed=record.speed, size=record.size,
+                          bitrate=record.bitrate, fragment=fragment)
+            self.on_progress(self.current_progress, self.current_time)
+
+            if self.report is not None:
+                self.report.add_sample(self.current_time, record.speed, record.bitrate, record.size)
+
+            if closed:
+                # Parada limpia: el fragmento anterior ya está cerrado y
+                # FFmpeg cierra también el que acaba de empezar
+                if self.stopping and self.is_processing and task:
+                    self.is_processing = False
+                    quit_sent = True
+                    self.supervisor.quit(task)
+                self.on_fragment(fragment, total_fragments)
+
+        self.on_fragment(fragment, total_fragments)
+        task = self._submit(cmd, on_progress, partial(self._log_errors, "ERROR"))
+        try:
+            outcome = task.result()
+        finally:
+            self._release(task)
+        error = self._task_error(outcome)
+        self._report_task(task)
+        # El último fragmento se cierra con el trailer, ya sin progreso; tras
+        # un error o una parada puede estar incompleto
+        poll_segments(complete=not error and self.is_processing)
+        for segment_list in segment_lists:
+            try:
+                os.remove(segment_list)
+            except OSError:
+                pass
+        if unfinished:
+            self._discard_fragments(unfinished)
+        return error
+
+    def _discard_fragments(self, indexes):
+        """Borra fragmentos a medio escribir: no se listan ni quedan en la carpeta."""
+        removed = 0
+        with self._lock:
+            for segments in self.segments:
+                for index in indexes:
+                    segment = segments.pop(index, None)
+                    if segment is None:
+                        continue
+                    try:
+                        os.remove(segment["file"])
+                        removed += 1
+                    except OSError:
+                        pass
+            self.done_fragments.difference_update(indexes)
+        if removed:
+            numbers = ", ".join(str(index + 1) for index in sorted(indexes))
+            self.on_log(f"🗑️ Fragmento incompleto descartado: {numbers}")
+
+    def _read_segments(self, segment_lists, offsets, time_offset, reported):
+        """Lee las líneas nuevas de los segment lists y registra los fragmentos.
+
+        Devuelve (ordenados) los índices ya cerrados en todas las salidas que
+        no estaban en ``reported``, y los añade a ese conjunto.
+        """
+        for position, segment_list in enumerate(segment_lists):
+            entries, offsets[position] = read_segment_list(segment_list, offsets[position])
+            directory = segment_list.parent
+            for name, start, end in entries:
+                self._record_segment(position, directory / name,
+                                     start + time_offset, end + time_offset)
+        with self._lock:
+            complete = set(self.segments[0]).intersection(*self.segments[1:])
+        closed = sorted(complete - reported)
+        reported.update(closed)
+        return closed
+
+    def _record_segment(self, position, path, start, end, index=None):
+        """Anota un fragmento escrito en esta ejecución (índice tomado del nombre)."""
+        if index is None:
+            try:
+                index = int(Path(path).name.split("_", 1)[0])
+            except ValueError:
+                return
+        with self._lock:
+            self.segments[position][index] = {"file": Path(path), "start": round(start, 3),
+                                              "end": round(end, 3)}
+
+    def _run_size_split(self):
+        """Un FFmpeg que escribe el MP3 por stdout; aquí se corta por tamaño.
+
+        Devuelve un mensaje de error o None.
+        """
+        output = self.outputs[0]
+        output_dir = self.output_path(output)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        estimate = estimacion_espacio.estimate_output(
+            self.info, self.outputs, [(0.0, self.total_duration)], stream_copy=self.stream_copy)
+        expected = max(1, math.ceil(estimate["total"] / self.max_fragment_bytes))
+        fragment_started = time.perf_counter()
+        fragment_start = 0.0
+        finishing = False
+
+        def on_fragment(index, path, size, seconds):
+            nonlocal fragment_started, fragment_start
+            self._record_segment(0, path, fragment_start, fragment_start + seconds, index)
+            fragment_start += seconds
+            now = time.perf_counter()
+            if self.report is not None:
+                self.report.add_fragment(index, now - fragment_started, bytes=size,
+                                         duration=round(seconds, 3))
+            fragment_started = now
+            self.on_log(f"📦 {path.name}: {estimacion_espacio.format_bytes(size)}, {seconds:.1f}s")
+            current = index + 1 if finishing else index + 2
+            self._publish(fragment=current, total_fragments=max(expected, current))
+            self.on_fragment(current, max(expected, current))
+
+        splitter = division_tamano.MP3SizeSplitter(
+            lambda index: output_dir / f"{index:03d}_{self.base_name}.{output['extension']}",
+            self.max_fragment_bytes,
+            on_fragment
+        )
+        write_error = None
+
+        # El flujo completo también va al MP3 intermedio de la caché
+        cache = cache_intermedia.intermediate_cache()
+        intermediate_path = cache.reserve() if self.intermediate_variant else None
+        intermediate = open(intermediate_path, "wb") if intermediate_path else None
+
+        def on_data(chunk):
+            nonlocal write_error
+            try:
+                splitter.feed(chunk)
+                if intermediate is not None:
+                    intermediate.write(chunk)
+            except OSError as e:
+                write_error = e
+                raise
+
+        def on_progress(record):
+            if record.time is None or self.total_duration <= 0:
+                return
+            self.current_time = record.time
+            self.current_progress = min(1.0, self.current_time / self.total_duration)
+            self._publish(time=self.current_time, progress=self.current_progress,
+                          speed=record.speed, size=record.size, bitrate=record.bitrate,
+                          fragment=splitter.index + 1)
+            self.on_progress(self.current_progress, self.current_time)
+            if self.report is not None:
+                self.report.add_sample(self.current_time, record.speed, record.bitrate, record.size)
+
+        cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "info",
+            "-i", str(self.source_file),
+            "-progress", "pipe:2",
+            "-nostats",
+            "-y",
+            *_encoder_args(output, threads=0),
+            # Flujo de tramas limpio: sin Xing global ni etiqueta ID3
+            "-write_xing", "0",
+            "-id3v2_version", "0",
+            "-f", "mp3",
+            "pipe:1"
+        ]
+        self.on_fragment(1, expected)
+        task = self._submit(cmd, on_progress, partial(self._log_errors, "ERROR"), on_data=on_data)
+        try:
+            outcome = task.result()
+        finally:
+            self._release(task)
+        self._report_task(task)
+        if intermediate is not None:
+            intermediate.close()
+
+        error = self._task_error(outcome)
+        if write_error is not None:
+            error = f"Error escribiendo fragmentos: {write_error}"
+        # Tras una parada limpia FFmpeg cerró el flujo: el último fragmento vale
+        stopped_cleanly = self.stopping and outcome["returncode"] == 0 and not outcome["cancelled"]
+        if error or outcome["cancelled"] or not (self.is_processing or stopped_cleanly):
+            splitter.abort()
+            if intermediate_path is not None:
+                cache.remove_file(intermediate_path)
+            return error
+        finishing = True
+        splitter.finish()
+        if stopped_cleanly:
+            # Un MP3 incompleto no sirve como intermedio
+            if intermediate_path is not None:
+                cache.remove_file(intermediate_path)
+            return None
+        if intermediate_path is not None:
+            cache.store(self.input_file, self.intermediate_variant, intermediate_path,
+                        self.total_duration)
+        if splitter.skipped_bytes:
+            self.on_log(f"⚠️ Se descartaron {splitter.skipped_bytes} bytes que no eran tramas MP3")
+        return None
+
+    def _run_parallel(self):
+        """Cada fragmento con su propio FFmpeg, como mucho ``max_workers`` a la vez;
+        devuelve un mensaje de error o None."""
+        if self.total_duration <= 0:
+            return "Duración desconocida: no se puede dividir en paralelo"
+
+        ranges = self.fragment_ranges()
+        total_fragments = len(ranges)
+        fragment_stats = [{"time": 0.0, "speed": 0.0, "size": 0, "written": None} for _ in ranges]
+        # Los fragmentos ya terminados en un intento anterior cuentan como hechos
+        for index in self.done_fragments:
+            start, end = ranges[index]
+            fragment_stats[index]["time"] = end - start
+        pending = [index for index in range(total_fragments) if index not in self.done_fragments]
+        fresh = not self.done_fragments
+        workers = min(self.max_workers, len(pending))
+        completed = len(self.done_fragments)
+        self._publish(fragments_done=completed)
+        self.on_fragment(completed, total_fragments)
+
+        # El supervisor limita la concurrencia del grupo: los fragmentos en
+        # espera no ocupan hilos ni procesos
+        tasks = {}
+        for index in pending:
+            start, end = ranges[index]
+            task = self._submit(
+                self._fragment_cmd(index, start, end),
+                partial(self._fragment_progress, index, end - start, fragment_stats),
+                partial(self._log_errors, f"ERROR [{index + 1:03d}]"),
+                group_limit=workers
+            )
+            tasks[task.future] = (index, task)
+
+        failures = []
+        try:
+            for future in as_completed(tasks):
+                outcome = future.result()
+                error = self._task_error(outcome)
+                if error:
+                    failures.append(error)
+                    # Un fragmento fallido cancela el resto del trabajo
+                    self.stop()
+                elif not outcome["cancelled"] and self.is_processing:
+                    index = tasks[future][0]
+                    start, end = ranges[index]
+                    written = fragment_stats[index]["written"]
+                    for position, path in enumerate(self.fragment_files(index)):
+                        self._record_segment(position, path, start,
+                                             end if written is None else start + written, index)
+                    self._report_task(tasks[future][1], index)
+                    self._mark_done(index, written)
+                    completed += 1
+                    self._publish(fragments_done=completed)
+                    self.on_fragment(completed, total_fragments)
+        finally:
+            for _, task in tasks.values():
+                self._release(task)
+            self.supervisor.release_group(id(self))
+
+        # Parada limpia: los fragmentos lanzados terminaron y el resto no empezó
+        if self.stopping and not failures and completed < total_fragments:
+            self.is_processing = False
+        # Los rangos son contiguos: si todos se codificaron ahora, unidos
+        # forman el MP3 intermedio igual que los del segmentador
+        self._full_pass = (fresh and not failures and completed == total_fragments
+                           and self.intermediate_variant is not None)
+        return failures[0] if failures else None
+
+    def _fragment_cmd(self, index, start, end):
+        """Comando que codifica un único fragmento buscando en la entrada con -ss/-t."""
+        cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel", "error",
+            "-ss", f"{start:.3f}",
+            "-t", f"{end - start:.3f}",
+            "-i", str(self.source_file),
+            "-progress", "pipe:1",
+            "-nostats",
+            "-y"
+        ]
+        for output in self.outputs:
+            output_dir = self.output_path(output)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            cmd += _encoder_args(output, threads=1)
+            cmd += [
+                "-f", output["segment_format"],
+            ]
+            cmd += _muxer_args(output, segmenter=False)
+            cmd += [
+                str(output_dir / f"{index:03d}_{self.base_name}.{output['extension']}")
+            ]
+        return cmd
+
+    def _fragment_progress(self, index, length, fragment_stats, record):
+        """Fusiona el avance de todos los fragmentos en un único progreso."""
+        with self._lock:
+            stats = fragment_stats[index]
+            if record.time is not None:
+                stats["time"] = min(length, record.time)
+                stats["written"] = record.time
+            stats["speed"] = 0.0 if record.end else (record.speed or 0.0)
+            stats["size"] = record.size or stats["size"]
+            self.current_time = sum(s["time"] for s in fragment_stats)
+            speed = sum(s["speed"] for s in fragment_stats)
+            size = sum(s["size"] for s in fragment_stats)
+        self.current_progress = min(1.0, self.current_time / self.total_duration)
+        self._publish(time=self.current_time, progress=self.current_progress,
+                      speed=speed, size=size)
+        if self.report is not None:
+            self.report.add_sample(self.current_time, speed, None, size)
+        self.on_progress(self.current_progress, self.current_time)
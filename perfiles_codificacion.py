@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfiles de codificación MP3 (velocidad frente a calidad y tamaño)
+- music: VBR -q:a 2, estéreo, frecuencia original (el comportamiento de siempre)
+- speech: mono, 22,05 kHz, CBR 48 kbps y algoritmo rápido de LAME
+- archive: VBR -q:a 0 con el algoritmo más cuidadoso de LAME
+- fast-preview: mono, 16 kHz, CBR 32 kbps, lo más rápido posible
+- Modo automático: codifica una muestra corta de la entrada con cada
+  perfil y elige el más rápido que cumple un bitrate o tamaño objetivo
+"""
+
+import subprocess
+import time
+
+from estimacion_espacio import parse_bitrate
+
+
+# compression_level es el "-q" de LAME (algoritmo): 0 = más cuidadoso y
+# lento, 9 = más rápido. No confundir con la calidad VBR (-q:a).
+PROFILES = {
+    "music": {"label": "Música", "quality": 2, "bitrate": None,
+              "channels": None, "sample_rate": None, "compression_level": None},
+    "speech": {"label": "Voz", "quality": None, "bitrate": "48k",
+               "channels": 1, "sample_rate": 22050, "compression_level": 7},
+    "archive": {"label": "Archivo", "quality": 0, "bitrate": None,
+                "channels": None, "sample_rate": None, "compression_level": 0},
+    "fast-preview": {"label": "Vista previa rápida", "quality": None, "bitrate": "32k",
+                     "channels": 1, "sample_rate": 16000, "compression_level": 9},
+}
+
+DEFAULT_PROFILE = "music"
+AUTO = "auto"
+
+# La vista previa no está pensada como salida final: el modo automático no la elige
+AUTO_CANDIDATES = ("archive", "music", "speech")
+
+DEFAULT_SAMPLE_SECONDS = 20
+DEFAULT_TARGET_KBPS = 128
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def profile_settings(name):
+    """Campos de salida de un perfil (``auto`` usa los de ``music`` hasta elegir)."""
+    if name == AUTO:
+        name = DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Perfil de codificación desconocido: {name}")
+    return {key: value for key, value in PROFILES[name].items() if key != "label"}
+
+
+def target_bits_per_second(duration, target_bitrate=None, target_size=None):
+    """Bitrate objetivo a partir de un bitrate ("96k") o de un tamaño total en bytes.
+
+    Valores no positivos se ignoran y queda el objetivo por defecto.
+    """
+    if target_size and target_size > 0 and duration > 0:
+        return target_size * 8 / duration
+    bitrate = parse_bitrate(target_bitrate)
+    return bitrate if bitrate and bitrate > 0 else DEFAULT_TARGET_KBPS * 1000
+
+
+def sample_window(duration, seconds=DEFAULT_SAMPLE_SECONDS):
+    """(inicio, duración) de la muestra: del centro, lejos de intros en silencio."""
+    seconds = min(seconds, duration) if duration > 0 else seconds
+    return max(0.0, duration / 2 - seconds / 2), seconds
+
+
+def benchmark_profile(input_file, name, encode_args, start, seconds, popen_flags=None):
+    """Codifica la muestra con un perfil; devuelve tiempo, velocidad y bitrate, o None."""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-ss", f"{start:.3f}", "-t", f"{seconds:.3f}",
+        "-i", str(input_file),
+        *encode_args(name),
+        "-write_xing", "0", "-f", "mp3", "pipe:1"
+    ]
+    began = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, **(popen_flags or {}))
+    except OSError:
+        return None
+    wall = time.perf_counter() - began
+    if result.returncode != 0 or not result.stdout or wall <= 0:
+        return None
+    return {
+        "profile": name,
+        "wall": round(wall, 4),
+        "speed": round(seconds / wall, 2),
+        "bitrate": round(len(result.stdout) * 8 / seconds),
+        "bytes": len(result.stdout)
+    }
+
+
+def choose_profile(input_file, duration, encode_args, target_bitrate=None, target_size=None,
+                   candidates=AUTO_CANDIDATES, sample_seconds=DEFAULT_SAMPLE_SECONDS,
+                   popen_flags=None, log=_noop):
+    """Elige el perfil más rápido que no supera el bitrate objetivo.
+
+    ``encode_args(nombre)`` devuelve los argumentos de FFmpeg de un perfil.
+    Si ninguno cumple, se elige el de menor bitrate; si no se pudo medir
+    ninguno, ``DEFAULT_PROFILE``. Devuelve ``(nombre, resultados)``.
+    """
+    target = target_bits_per_second(duration, target_bitrate, target_size)
+    start, seconds = sample_window(duration, sample_seconds)
+    results = []
+    for name in candidates:
+        result = benchmark_profile(input_file, name, encode_args, start, seconds, popen_flags)
+        if result is None:
+            log(f"⚠️ No se pudo probar el perfil {name}")
+            continue
+        result["meets_target"] = result["bitrate"] <= target
+        results.append(result)
+        log(f"🎚️ Perfil {name}: {result['speed']:.1f}x, {result['bitrate'] / 1000:.0f} kbps")
+
+    if not results:
+        return DEFAULT_PROFILE, results
+    meeting = [result for result in results if result["meets_target"]]
+    if meeting:
+        chosen = min(meeting, key=lambda result: result["wall"])
+    else:
+        chosen = min(results, key=lambda result: result["bitrate"])
+        log(f"⚠️ Ningún perfil baja de {target / 1000:.0f} kbps; se usa el de menor bitrate")
+    return chosen["profile"], results
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de actividad con búfer circular
+- Cualquier hilo puede escribir sin tocar tkinter
+- La interfaz vacía el búfer por lotes unas pocas veces por segundo
+- Límite de líneas retenidas y copia completa opcional en disco
+"""
+
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class LogBuffer:
+    """Búfer circular de líneas de log, seguro entre hilos.
+
+    Si se escriben más de ``max_lines`` líneas entre dos vaciados, las más
+    antiguas se descartan y se cuentan en ``dropped``; el archivo de log,
+    si está abierto, recibe siempre todas las líneas.
+    """
+
+    def __init__(self, max_lines=1000, log_file=None):
+        self._lines = deque(maxlen=max_lines)
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._file = None
+        if log_file:
+            self.open_file(log_file)
+
+    def open_file(self, path, mode="w"):
+        """Abre (o cambia) el archivo donde se guarda el log completo."""
+        with self._lock:
+            self._close_file()
+            try:
+                self._file = open(path, mode, encoding="utf-8", buffering=1)
+            except OSError:
+                self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+    def _close_file(self):
+        if self._file:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def write(self, message):
+        """Añade un mensaje con marca de hora (desde cualquier hilo)."""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        line = f"[{timestamp}] {message}"
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped += 1
+            self._lines.append(line)
+            if self._file:
+                try:
+                    self._file.write(line + "\n")
+                except OSError:
+                    self._close_file()
+
+    def drain(self):
+        """Devuelve y vacía las líneas pendientes: (líneas, descartadas)."""
+        with self._lock:
+            lines = list(self._lines)
+            dropped = self._dropped
+            self._lines.clear()
+            self._dropped = 0
+        return lines, dropped
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+            self._dropped = 0
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Supervisor de procesos FFmpeg basado en asyncio
+- Un único hilo con un bucle de eventos lee la salida de muchos FFmpeg
+- Los bloques clave=valor de ``-progress`` se convierten en ProgressRecord
+- Fin del proceso, cancelación y timeout llegan como resultado del trabajo
+- Opcionalmente, la salida binaria (stdout) se entrega por bloques y el
+  progreso se lee de stderr (``-progress pipe:2``)
+- Parada limpia (tecla ``q`` por stdin) y pausa/reanudación del proceso
+  sin bloquear al hilo que las pide
+"""
+
+import asyncio
+import ctypes
+import os
+import re
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from typing import NamedTuple, Optional
+
+
+PROGRESS_LINE = re.compile(r"^([a-z0-9_]+)=(.*)$")
+
+
+class ProgressRecord(NamedTuple):
+    """Un bloque de ``-progress`` de FFmpeg ya interpretado."""
+    time: Optional[float]      # Segundos de audio escritos
+    speed: Optional[float]     # Velocidad respecto a tiempo real (1.0 = 1x)
+    size: Optional[int]        # Bytes escritos
+    bitrate: Optional[str]     # Bitrate de salida tal y como lo informa FFmpeg
+    end: bool                  # True en el último bloque (progress=end)
+
+
+def parse_progress_line(line, block):
+    """Acumula una línea clave=valor de ``-progress``; True si cierra el bloque."""
+    match = PROGRESS_LINE.match(line)
+    if not match:
+        return False
+    block[match.group(1)] = match.group(2).strip()
+    return match.group(1) == "progress"
+
+
+def progress_record(block):
+    """Convierte un bloque de ``-progress`` en un ProgressRecord."""
+    # out_time_ms está en microsegundos (igual que out_time_us) por herencia de FFmpeg
+    raw_time = block.get("out_time_us") or block.get("out_time_ms")
+    speed = block.get("speed", "").rstrip("x")
+    size = block.get("total_size", "")
+    try:
+        seconds = max(0.0, int(raw_time) / 1_000_000.0) if raw_time else None
+    except ValueError:
+        seconds = None
+    try:
+        speed = float(speed)
+    except ValueError:
+        speed = None
+    return ProgressRecord(
+        time=seconds,
+        speed=speed,
+        size=int(size) if size.isdigit() else None,
+        bitrate=block.get("bitrate"),
+        end=block.get("progress") == "end"
+    )
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+class FFmpegTask:
+    """Proceso supervisado. ``future`` se resuelve con un dict:
+    ``returncode``, ``cancelled`` y ``timed_out``.
+
+    ``times`` guarda instantes de ``time.perf_counter()``: ``submitted``,
+    ``spawn_started``, ``spawned``, ``first_progress``, ``last_progress`` y
+    ``finished`` (solo los que llegaron a ocurrir).
+
+    Con ``on_data`` el stdout del proceso se entrega en bloques de bytes y
+    las líneas (progreso y log) se leen de stderr. Si ``on_data`` lanza una
+    excepción, el proceso se termina y el resultado lleva ``error``.
+
+    ``paused`` indica si el proceso está suspendido; el tiempo en pausa no
+    cuenta para el ``timeout``.
+    """
+
+    def __init__(self, cmd, on_progress, on_line, timeout, popen_kwargs, group, on_data=None):
+        self.cmd = cmd
+        self.on_progress = on_progress or _noop
+        self.on_line = on_line or _noop
+        self.on_data = on_data
+        self.timeout = timeout
+        self.popen_kwargs = popen_kwargs
+        self.group = group
+        self.future = Future()
+        self.times = {"submitted": time.perf_counter()}
+        self.process = None
+        self._task = None
+        self._spawning = False
+        self._cancel_requested = False
+        self._quit_requested = False
+        self._pause_requested = False
+        self.paused = False
+        self.paused_seconds = 0.0
+        self._paused_at = None
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+class FFmpegSupervisor:
+    """Ejecuta procesos FFmpeg y multiplexa su salida en un solo hilo.
+
+    ``submit`` se puede llamar desde cualquier hilo; los callbacks de cada
+    trabajo se ejecutan en el hilo del supervisor y deben ser rápidos.
+    Con ``group`` y ``group_limit`` se acota cuántos procesos de un mismo
+    grupo corren a la vez (el resto espera sin ocupar hilos).
+    """
+
+    DATA_CHUNK = 64 * 1024   # Bytes leídos de stdout por llamada a on_data
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run_loop, args=(ready,),
+                                                name="ffmpeg-supervisor", daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _run_loop(self, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        ready.set()
+        self._loop.run_forever()
+
+    def submit(self, cmd, on_progress=None, on_line=None, timeout=None,
+               popen_kwargs=None, group=None, group_limit=None, on_data=None):
+        """Lanza ``cmd`` bajo supervisión y devuelve su FFmpegTask."""
+        task = FFmpegTask(cmd, on_progress, on_line, timeout, dict(popen_kwargs or {}), group,
+                          on_data)
+        loop = self._ensure_loop()
+
+        def schedule():
+            task._task = loop.create_task(self._supervise(task, group_limit))
+
+        loop.call_soon_threadsafe(schedule)
+        return task
+
+    def cancel(self, task):
+        """Cancela un trabajo (pendiente o en curso) desde cualquier hilo."""
+        task._cancel_requested = True
+        if self._loop is None:
+            return
+
+        def cancel_in_loop():
+            # Durante el arranque no se interrumpe: se cancela justo después,
+            # cuando ya hay un proceso que terminar
+            if task._task is not None and not task._spawning:
+                task._task.cancel()
+
+        self._loop.call_soon_threadsafe(cancel_in_loop)
+
+    def quit(self, task):
+        """Pide a FFmpeg que termine limpiamente, como al pulsar ``q``.
+
+        FFmpeg deja de leer la entrada, cierra los archivos abiertos (con su
+        cabecera/trailer) y sale con código 0. No espera a que lo haga.
+        """
+        task._quit_requested = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._send_quit, task)
+
+    def pause(self, task):
+        """Suspende el proceso (o lo hará nada más arrancar si aún espera)."""
+        task._pause_requested = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._apply_pause, task)
+
+    def resume(self, task):
+        """Reanuda un proceso suspendido con ``pause``."""
+        task._pause_requested = False
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._apply_pause, task)
+
+    def release_group(self, group):
+        """Olvida el semáforo de un grupo cuando ya no tiene trabajos."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._groups.pop, group, None)
+
+    async def _supervise(self, task, group_limit):
+        semaphore = None
+        if task.group is not None and group_limit:
+            semaphore = self._groups.setdefault(task.group, asyncio.Semaphore(group_limit))
+
+        result = {"returncode": None, "cancelled": False, "timed_out": False}
+        try:
+            if semaphore is not None:
+                async with semaphore:
+                    await self._run_process(task, result)
+            else:
+                await self._run_process(task, result)
+        except asyncio.CancelledError:
+            result["cancelled"] = True
+        except Exception as e:
+            result["error"] = str(e)
+        finally:
+            if task.process is not None:
+                # Un proceso suspendido no atiende SIGTERM hasta reanudarse
+                task._pause_requested = False
+                self._apply_pause(task)
+                await self._terminate(task.process)
+                result["returncode"] = task.process.returncode
+            if task._cancel_requested:
+                result["cancelled"] = True
+            task.times["finished"] = time.perf_counter()
+            if not task.future.done():
+                task.future.set_result(result)
+
+    async def _run_process(self, task, result):
+        if task._cancel_requested:
+            raise asyncio.CancelledError()
+
+        task._spawning = True
+        task.times["spawn_started"] = time.perf_counter()
+        try:
+            task.process = await asyncio.create_subprocess_exec(
+                *task.cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE if task.on_data else asyncio.subprocess.STDOUT,
+                # stdin solo se usa para mandar la tecla "q" (parada limpia)
+                stdin=asyncio.subprocess.PIPE,
+                **task.popen_kwargs
+            )
+        finally:
+            task._spawning = False
+        task.times["spawned"] = time.perf_counter()
+        if task._cancel_requested:
+            raise asyncio.CancelledError()
+        if task._quit_requested:
+            self._send_quit(task)
+        self._apply_pause(task)
+
+        reader = asyncio.ensure_future(self._read(task))
+        try:
+            result["returncode"] = await self._wait_unpaused(task, reader)
+        except asyncio.TimeoutError:
+            result["timed_out"] = True
+        finally:
+            reader.cancel()
+
+    async def _wait_unpaused(self, task, reader):
+        """Espera a ``reader`` con el timeout del trabajo, sin contar las pausas."""
+        if task.timeout is None:
+            return await reader
+        while True:
+            paused = task.paused_seconds + (time.perf_counter() - task._paused_at
+                                            if task._paused_at is not None else 0.0)
+            remaining = task.timeout + paused - (time.perf_counter() - task.times["spawned"])
+            if task._paused_at is not None:
+                # En pausa el plazo no corre: se vuelve a mirar en un rato
+                remaining = max(remaining, 1.0)
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            done, _ = await asyncio.wait({reader}, timeout=min(remaining, 1.0))
+            if done:
+                return reader.result()
+
+    def _send_quit(self, task):
+        process = task.process
+        if process is None or process.returncode is not None or process.stdin is None:
+            return
+        # Suspendido no podría leer la tecla
+        task._pause_requested = False
+        self._apply_pause(task)
+        try:
+            process.stdin.write(b"q")
+        except (BrokenPipeError, ConnectionResetError, RuntimeError):
+            pass
+
+    def _apply_pause(self, task):
+        process = task.process
+        if process is None or process.returncode is not None:
+            return
+        if task._pause_requested == task.paused:
+            return
+        try:
+            _suspend_process(process, task._pause_requested)
+        except (OSError, AttributeError):
+            return
+        task.paused = task._pause_requested
+        now = time.perf_counter()
+        if task.paused:
+            task._paused_at = now
+        elif task._paused_at is not None:
+            task.paused_seconds += now - task._paused_at
+            task._paused_at = None
+
+    async def _read(self, task):
+        if task.on_data is None:
+            await self._read_lines(task, task.process.stdout)
+        else:
+            await asyncio.gather(self._read_lines(task, task.process.stderr),
+                                 self._read_data(task))
+        return await task.process.wait()
+
+    async def _read_data(self, task):
+        while True:
+            chunk = await task.process.stdout.read(self.DATA_CHUNK)
+            if not chunk:
+                return
+            task.on_data(chunk)
+
+    async def _read_lines(self, task, stream):
+        block = {}
+        async for raw in stream:
+            line = raw.decode("utf-8", errors="replace").strip()
+            if not line:
+                continue
+            try:
+                if parse_progress_line(line, block):
+                    now = time.perf_counter()
+                    task.times.setdefault("first_progress", now)
+                    task.times["last_progress"] = now
+                    task.on_progress(progress_record(block))
+                    block = {}
+                else:
+                    task.on_line(line)
+            except Exception:
+                # Un consumidor defectuoso no debe detener la lectura
+                block = {}
+
+    async def _terminate(self, process):
+        if process.returncode is not None:
+            return
+        _send_signal(process, signal.SIGTERM)
+        try:
+            # Ya no hay lectores: se vacía stdout para que la tubería se
+            # cierre y wait() no se quede esperando a un búfer lleno
+            await asyncio.wait_for(asyncio.gather(process.wait(), _drain(process.stdout)), 5)
+        except asyncio.TimeoutError:
+            _send_signal(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+            await process.wait()
+
+
+async def _drain(stream):
+    while stream is not None and await stream.read(65536):
+        pass
+
+
+def _send_signal(process, sig):
+    """Envía ``sig`` sin recoger al proceso hijo.
+
+    En POSIX, ``Popen.send_signal`` hace antes un ``poll()`` que puede
+    recoger al hijo en lugar del observador de asyncio (que entonces avisa
+    de un pid desconocido); por eso se usa ``os.kill`` directamente.
+    """
+    try:
+        if os.name == "posix":
+            os.kill(process.pid, sig)
+        elif sig == signal.SIGTERM:
+            process.terminate()
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+# Permiso de OpenProcess para NtSuspendProcess/NtResumeProcess (Windows)
+PROCESS_SUSPEND_RESUME = 0x0800
+
+
+def _suspend_process(process, suspend):
+    """Suspende o reanuda un proceso hijo.
+
+    En POSIX se usa SIGSTOP/SIGCONT; en Windows, las llamadas de ntdll que
+    suspenden todos los hilos del proceso.
+    """
+    if os.name == "posix":
+        os.kill(process.pid, signal.SIGSTOP if suspend else signal.SIGCONT)
+        return
+    kernel32 = ctypes.windll.kernel32
+    ntdll = ctypes.windll.ntdll
+    handle = kernel32.OpenProcess(PROCESS_SUSPEND_RESUME, False, process.pid)
+    if not handle:
+        raise OSError("No se pudo abrir el proceso para suspenderlo")
+    try:
+        (ntdll.NtSuspendProcess if suspend else ntdll.NtResumeProcess)(handle)
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def default_supervisor():
+    """Supervisor compartido por todos los motores del proceso."""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = FFmpegSupervisor()
+        return _supervisor
+
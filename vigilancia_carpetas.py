@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vigilancia de carpetas para ingesta continua
+- Revisa periódicamente una o varias carpetas (sin dependencias externas)
+- Un archivo se encola cuando su tamaño y fecha dejan de cambiar
+- Concurrencia acotada y límite de trabajos en espera
+- Registro persistente de archivos procesados: reiniciar no repite trabajo
+- Los fallos se reintentan al reiniciar o pasado un tiempo de espera
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from cache_audio import FileCache
+from cola_conversion import AUDIO_EXTENSIONS, BatchQueue
+from motor_conversion import get_audio_info
+
+
+DEFAULT_STABLE_SECONDS = 10.0   # Tiempo sin cambios para dar un archivo por completo
+DEFAULT_POLL_INTERVAL = 2.0     # Segundos entre revisiones de las carpetas
+DEFAULT_MAX_BACKLOG = 100       # Trabajos encolados o en curso como máximo
+DEFAULT_RETRY_SECONDS = 300.0   # Espera antes de reintentar un archivo que falló
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+class ProcessedLedger(FileCache):
+    """Archivos ya procesados, indexados por ruta, tamaño y fecha.
+
+    Si un archivo cambia después de procesarse, vuelve a ser nuevo. Los
+    fallos también se guardan (con su mensaje) para poder reintentarlos.
+    """
+
+    def __init__(self, path=None, max_entries=50000):
+        path = Path(path) if path else None
+        super().__init__(path.stem if path else "vigilancia", max_entries=max_entries,
+                         directory=path.parent if path else None)
+
+
+class FolderWatcher:
+    """Convierte los archivos de audio que van apareciendo en ``directories``.
+
+    Los trabajos se ejecutan con ``BatchQueue.run_job`` (mismo formato de
+    trabajo y mismas opciones del motor que la cola por lotes); mientras
+    están encolados o en curso aparecen en ``queue.jobs``.
+    """
+
+    def __init__(self, directories, output_dir, max_jobs=None, max_backlog=DEFAULT_MAX_BACKLOG,
+                 stable_seconds=DEFAULT_STABLE_SECONDS, poll_interval=DEFAULT_POLL_INTERVAL,
+                 retry_seconds=DEFAULT_RETRY_SECONDS, recursive=False, ledger=None, engine_options=None, progress_channel=None,
+                 on_job_start=None, on_job_done=None, on_log=None):
+        self.directories = [Path(directory) for directory in directories]
+        self.output_dir = Path(output_dir)
+        self.max_backlog = max(1, max_backlog)
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+        self.retry_seconds = retry_seconds
+        self.recursive = recursive
+        self.ledger = ledger or ProcessedLedger()
+
+        self.on_job_done = on_job_done or _noop
+        self.on_log = on_log or _noop
+
+        self.queue = BatchQueue(
+            [],
+            output_dir=self.output_dir,
+            max_jobs=max_jobs,
+            engine_options=engine_options,
+            progress_channel=progress_channel,
+            on_job_start=on_job_start,
+            on_log=self.on_log
+        )
+        self.stats = {"queued": 0, "completed": 0, "failed": 0, "audio_seconds": 0.0}
+
+        self._candidates = {}
+        self._active = set()
+        self._backlog_full = False
+        self._started_at = time.time()
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def backlog(self):
+        """Trabajos encolados o en curso."""
+        with self._lock:
+            return len(self._active)
+
+    def run(self):
+        """Vigila las carpetas hasta que se llame a ``stop``."""
+        self._stop_event.clear()
+        self.queue.is_processing = True
+        start_time = self._started_at = time.time()
+        self.on_log(f"👀 Vigilando {', '.join(str(d) for d in self.directories)}")
+        output_dir = self.output_dir.resolve()
+        for directory in self.directories:
+            if directory.resolve() == output_dir:
+                self.on_log(f"⚠️ {directory} es también la carpeta de salida: "
+                            f"sus archivos no se encolan")
+
+        with ThreadPoolExecutor(max_workers=self.queue.max_jobs) as pool:
+            try:
+                while not self._stop_event.is_set():
+                    for path in self.scan():
+                        self._enqueue(pool, path)
+                    self._stop_event.wait(self.poll_interval)
+            finally:
+                # Tras stop() la cola ya se detuvo (quizá de forma limpia)
+                if not self._stop_event.is_set():
+                    self.queue.stop()
+                pool.shutdown(wait=True, cancel_futures=True)
+
+        elapsed = time.time() - start_time
+        audio_seconds = self.stats["audio_seconds"]
+        return dict(self.stats, elapsed=elapsed,
+                    speed=audio_seconds / elapsed if elapsed > 0 else 0.0)
+
+    def stop(self, graceful=False):
+        """Deja de vigilar y detiene los trabajos en curso.
+
+        Con ``graceful`` los trabajos en curso terminan su fragmento actual.
+        """
+        self._stop_event.set()
+        self.queue.stop(graceful=graceful)
+
+    def scan(self):
+        """Revisa las carpetas y devuelve los archivos listos para encolar.
+
+        Un archivo está listo cuando no está procesado (o falló y toca
+        reintentarlo), no está ya en la cola y su tamaño y fecha no han
+        cambiado en ``stable_seconds``.
+        """
+        now = time.monotonic()
+        seen = set()
+        ready = []
+        for path in self._list_files():
+            key = str(path)
+            seen.add(key)
+            with self._lock:
+                if key in self._active:
+                    continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self._candidates.get(key)
+            if previous is None or previous[0] != signature:
+                self._candidates[key] = (signature, now)
+                continue
+            if not stat.st_size or now - previous[1] < self.stable_seconds:
+                continue
+            entry = self.ledger.get_for_file(path, str(self.output_dir))
+            if entry is not None and not self._should_retry(entry):
+                continue
+            ready.append(path)
+
+        # Olvidar archivos que ya no existen
+        for key in set(self._candidates) - seen:
+            del self._candidates[key]
+
+        room = self.max_backlog - self.backlog
+        if len(ready) > room:
+            if not self._backlog_full:
+                self.on_log(f"⏳ Cola llena ({self.max_backlog} trabajos): "
+                            f"{len(ready) - max(room, 0)} archivos esperan")
+            self._backlog_full = True
+            ready = ready[:max(room, 0)]
+        else:
+            self._backlog_full = False
+        return ready
+
+    def _list_files(self):
+        output_dir = self.output_dir.resolve()
+        for directory in self.directories:
+            directory = directory.resolve()
+            # Entrada y salida mezcladas: los fragmentos se volverían a encolar
+            if directory == output_dir:
+                continue
+            # Solo una salida dentro de la carpeta vigilada puede colarse
+            inside = directory in output_dir.parents
+            pattern = "**/*" if self.recursive else "*"
+            for path in sorted(directory.glob(pattern)):
+                # Fuera: ocultos/temporales y lo que escribe el propio conversor
+                if (path.name.startswith(".") or path.suffix.lower() not in AUDIO_EXTENSIONS
+                        or not path.is_file()):
+                    continue
+                path = path.resolve()
+                if inside and output_dir in path.parents:
+                    continue
+                yield path
+
+    def _should_retry(self, entry):
+        """Un fallo se reintenta en cada arranque y pasado ``retry_seconds``."""
+        if entry.get("status") != "error":
+            return False
+        failed_at = entry.get("processed_at", 0.0)
+        return failed_at < self._started_at or time.time() - failed_at >= self.retry_seconds
+
+    def _enqueue(self, pool, path):
+        job = self.queue.new_job(path)
+        with self._lock:
+            self._active.add(str(path))
+            self.queue.jobs.append(job)
+            self.stats["queued"] += 1
+        self.on_log(f"📥 Nuevo archivo: {path.name} ({self.backlog} en cola)")
+        future = pool.submit(self._run_job, job)
+        future.add_done_callback(lambda _: self._finish(job))
+
+    def _run_job(self, job):
+        info = get_audio_info(job["input"], log=self.on_log)
+        job["duration"] = info["duration"] if info else 0.0
+        return self.queue.run_job(job)
+
+    def _finish(self, job):
+        with self._lock:
+            self._active.discard(str(job["input"]))
+            if job in self.queue.jobs:
+                self.queue.jobs.remove(job)
+            if job["status"] == "ok":
+                self.stats["completed"] += 1
+                self.stats["audio_seconds"] += job["duration"]
+            elif job["status"] == "error":
+                self.stats["failed"] += 1
+
+        # Cancelados (p. ej. al detener el servicio) se reintentan al volver;
+        # los fallos quedan anotados y se reintentan según _should_retry
+        if job["status"] in ("ok", "error"):
+            result = job["result"] or {}
+            self.ledger.put_for_file(job["input"], {
+                "status": job["status"],
+                "message": result.get("message", ""),
+                "files": len(result.get("files") or []),
+                "processed_at": time.time()
+            }, str(self.output_dir))
+        self.on_job_done(job)